@@ -0,0 +1,65 @@
+"""
+Lazy stand-ins for the Fabric functions used by this package.
+
+Importing `fabric.api` loads paramiko and its crypto dependencies, which is
+slow. The names here have the same signatures as the Fabric ones but only
+import Fabric on first use, so that command builders, parsers and version
+logic can be imported cheaply.
+"""
+
+
+def run(*args, **kwargs):
+    from fabric.api import run
+    return run(*args, **kwargs)
+
+
+def sudo(*args, **kwargs):
+    from fabric.api import sudo
+    return sudo(*args, **kwargs)
+
+
+def get(*args, **kwargs):
+    from fabric.api import get
+    return get(*args, **kwargs)
+
+
+def hide(*args, **kwargs):
+    from fabric.api import hide
+    return hide(*args, **kwargs)
+
+
+def settings(*args, **kwargs):
+    from fabric.api import settings
+    return settings(*args, **kwargs)
+
+
+def shell_env(*args, **kwargs):
+    from fabric.context_managers import shell_env
+    return shell_env(*args, **kwargs)
+
+
+def exists(*args, **kwargs):
+    from fabric.contrib.files import exists
+    return exists(*args, **kwargs)
+
+
+def disconnect_all(*args, **kwargs):
+    from fabric.network import disconnect_all
+    return disconnect_all(*args, **kwargs)
+
+
+class _Env(object):
+    """
+    Proxy for `fabric.api.env`.
+    """
+
+    def __getattr__(self, name):
+        from fabric.api import env
+        return getattr(env, name)
+
+    def __setattr__(self, name, value):
+        from fabric.api import env
+        setattr(env, name, value)
+
+
+env = _Env()
@@ -0,0 +1,207 @@
+import re
+
+from fabric_package_management import cache
+from fabric_package_management._fabric import hide, run, settings, sudo
+
+#: Lists the `name-version` of every installed package.
+INSTALLED_PACKAGES_CMD = 'apk info -v'
+
+_NAME_VERSION = re.compile(r'^(.+)-(\d[^-]*-r\d+)$')
+
+
+def _run_cmd(func, cmd, verbose):
+    """
+    Utility function to run commands respecting `use_sudo` and `verbose`.
+    """
+    changes = not cmd.startswith('apk info ')
+    if changes:
+        # Package changes drop the host's cached queries, before and after
+        # the command runs.
+        cache.invalidate()
+    try:
+        if verbose:
+            return func(cmd)
+        with settings(hide('everything')):
+            return func(cmd)
+    finally:
+        if changes:
+            cache.invalidate()
+
+
+def install(packages, use_sudo=True, verbose=True, no_cache=False):
+    """
+    Install packages on the remote host via apk.
+
+    Args:
+      packages (list or str): The packages to install.
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+      no_cache (bool): If `True`, do not use or keep a local cache of the
+        package index. (Default: `False`)
+    """
+    if not isinstance(packages, str):
+        packages = ' '.join(packages)
+
+    if no_cache:
+        cache = '--no-cache'
+    else:
+        cache = ''
+
+    func = use_sudo and sudo or run
+    cmd = 'apk add {0} {1}'.format(cache, packages)
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def remove(packages, purge=False, use_sudo=True, verbose=True):
+    """
+    Remove a package or list of packages from the remote host.
+
+    Args:
+      packages (list or str): The packages to remove.
+      purge (bool): If `True` any configuration files are deleted too.
+        (Default: `False`)
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+    """
+    if not isinstance(packages, str):
+        packages = ' '.join(packages)
+
+    if purge:
+        purge = '--purge'
+    else:
+        purge = ''
+
+    func = use_sudo and sudo or run
+    cmd = 'apk del {0} {1}'.format(purge, packages)
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def update(use_sudo=True, verbose=True):
+    """
+    Update apk's package index on the remote host.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+    """
+    func = use_sudo and sudo or run
+    cmd = 'apk update'
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def upgrade(use_sudo=True, verbose=True):
+    """
+    Install the newest versions of all packages on the remote host.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+    """
+    func = use_sudo and sudo or run
+    cmd = 'apk upgrade'
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def installed(package, use_sudo=False):
+    """
+    Check if a package is installed on the system.
+
+    Returns `True` if installed, `False` if it is not.
+
+    Args:
+      package (str): The package to check if installed.
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    func = use_sudo and sudo or run
+    cmd = 'apk info -e {0}'.format(package)
+
+    def query():
+        with settings(warn_only=True):
+            return _run_cmd(func, cmd, verbose=False).succeeded
+    return cache.cached(cmd, query)
+
+
+def installed_packages(use_sudo=False):
+    """
+    List every installed package and its version in a single call.
+
+    Returns a dict mapping package names to versions. Raises `RuntimeError`
+    if the packages could not be listed.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    func = use_sudo and sudo or run
+
+    def query():
+        with settings(warn_only=True):
+            output = _run_cmd(func, INSTALLED_PACKAGES_CMD, verbose=False)
+        if output.failed:
+            raise RuntimeError('apk info failed with status {0}'.format(
+                output.return_code))
+        return parse_installed_packages(output)
+    return cache.cached(INSTALLED_PACKAGES_CMD, query)
+
+
+def parse_installed_packages(output):
+    """
+    Parse the output of `apk info -v`.
+
+    Returns a dict mapping package names to versions.
+
+    Args:
+      output (str): Lines of `name-version-rN`.
+    """
+    packages = {}
+    for line in output.splitlines():
+        match = _NAME_VERSION.match(line.strip())
+        if match is not None:
+            packages[match.group(1)] = match.group(2)
+    return packages
+
+
+def available_versions(package):
+    """
+    List the versions of a package available from the configured
+    repositories.
+
+    Returns a list of versions, in the order listed.
+
+    Args:
+      package (str): The package name.
+    """
+    cmd = 'apk policy {0}'.format(package)
+
+    def query():
+        return parse_available_versions(run(cmd, quiet=True))
+    return cache.cached(cmd, query)
+
+
+def parse_available_versions(output):
+    """
+    Parse the output of `apk policy`.
+
+    Returns a list of the distinct versions.
+
+    Args:
+      output (str): The versions indented by two spaces and followed by a
+        colon, each with its repositories indented below it.
+    """
+    versions = []
+    for line in output.splitlines():
+        if not line.startswith('  ') or line.startswith('   '):
+            continue
+        version = line.strip().rstrip(':')
+        if version and version not in versions:
+            versions.append(version)
+    return versions
@@ -1,21 +1,48 @@
-from fabric.api import hide, run, settings, sudo
-from fabric.context_managers import shell_env
-from fabric.contrib.files import exists
+import os
+
+from fabric_package_management import cache
+from fabric_package_management._fabric import (
+    exists, get, hide, run, settings, shell_env, sudo)
+
+#: Lists the abbreviated status, name and version of every known package.
+INSTALLED_PACKAGES_CMD = ("dpkg-query -W "
+                          "-f='${db:Status-Abbrev}\\t${Package}\\t"
+                          "${Version}\\n'")
 
 
 def _run_cmd(func, cmd, verbose):
     """
     Utility function to run commands respecting `use_sudo` and `verbose`.
     """
-    with shell_env(DEBIAN_FRONTEND='noninteractive'):
-        if verbose:
-            return func(cmd)
-        with settings(hide('everything')):
-            return func(cmd)
+    changes = cmd.startswith('apt-get ')
+    if changes:
+        # Any apt-get command may change what the cached queries return.
+        # Entries are dropped again afterwards in case a query of the host
+        # was cached while the command ran.
+        cache.invalidate()
+    try:
+        with shell_env(DEBIAN_FRONTEND='noninteractive'):
+            if verbose:
+                return func(cmd)
+            with settings(hide('everything')):
+                return func(cmd)
+    finally:
+        if changes:
+            cache.invalidate()
+
+
+def _config_options(config):
+    """
+    Utility function to turn a dict of Apt configuration options into `-o`
+    command line options.
+    """
+    return ['-o {0}={1}'.format(key, value)
+            for key, value in sorted((config or {}).items())]
 
 
 def install(packages, assume_yes=True, no_install_recommends=False,
-            install_suggests=False, use_sudo=True, verbose=True, force_yes=False):
+            install_suggests=False, use_sudo=True, verbose=True, force_yes=False,
+            config=None):
     """
     Install packages on the remote host via Apt.
 
@@ -31,6 +58,8 @@ def install(packages, assume_yes=True, no_install_recommends=False,
         (Default: `True`)
       verbose (bool): If `False`, hide all output. (Default: `True`)
       force_yes (bool): add the --force-yes apt-get option. (Default: `False`)
+      config (dict): Apt configuration options to set, e.g.
+        `{'Acquire::http::Dl-Limit': 500}`.
     """
     if not isinstance(packages, str):
         packages = ' '.join(packages)
@@ -49,6 +78,8 @@ def install(packages, assume_yes=True, no_install_recommends=False,
     if force_yes:
         options.append('--force-yes')
 
+    options.extend(_config_options(config))
+
     func = use_sudo and sudo or run
     cmd = 'apt-get install {0} {1}'.format(
         ' '.join(options), packages
@@ -57,7 +88,7 @@ def install(packages, assume_yes=True, no_install_recommends=False,
     return _run_cmd(func, cmd, verbose)
 
 
-def update(use_sudo=True, verbose=True, source_name=None):
+def update(use_sudo=True, verbose=True, source_name=None, config=None):
     """
     Update Apt's package index files on the remote host.
 
@@ -66,16 +97,20 @@ def update(use_sudo=True, verbose=True, source_name=None):
         (Default: `True`)
       verbose (bool): If `False`, hide all output. (Default: `True`)
       source_name (str): If set, update only the sources defined in that sources.list.d file.
+      config (dict): Apt configuration options to set, e.g.
+        `{'Acquire::http::Dl-Limit': 500}`.
     """
     func = use_sudo and sudo or run
     cmd = 'apt-get update'
     if source_name is not None:
         cmd += " -o Dir::Etc::sourceparts='-' "
         cmd += "-o Dir::Etc::sourcelist='sources.list.d/{}.list'".format(source_name)
+    if config:
+        cmd += ' ' + ' '.join(_config_options(config))
     return _run_cmd(func, cmd, verbose)
 
 
-def upgrade(assume_yes=True, use_sudo=True, verbose=True):
+def upgrade(assume_yes=True, use_sudo=True, verbose=True, config=None):
     """
     Install the newest versions of all packages on the remote host.
 
@@ -85,6 +120,8 @@ def upgrade(assume_yes=True, use_sudo=True, verbose=True):
       use_sudo (bool): If `True`, will use `sudo` instead of `run`.
         (Default: `True`)
       verbose (bool): If `False`, hide all output. (Default: `True`)
+      config (dict): Apt configuration options to set, e.g.
+        `{'Acquire::http::Dl-Limit': 500}`.
     """
     if assume_yes:
         yes = '--yes'
@@ -93,11 +130,13 @@ def upgrade(assume_yes=True, use_sudo=True, verbose=True):
 
     func = use_sudo and sudo or run
     cmd = 'apt-get upgrade {0}'.format(yes)
+    if config:
+        cmd += ' ' + ' '.join(_config_options(config))
 
     return _run_cmd(func, cmd, verbose)
 
 
-def dist_upgrade(assume_yes=True, use_sudo=True, verbose=True):
+def dist_upgrade(assume_yes=True, use_sudo=True, verbose=True, config=None):
     """
     Same as `upgrade`, but Apt will attempt to intelligently handle changing
     dependencies, installing new dependencies as needed.
@@ -108,6 +147,8 @@ def dist_upgrade(assume_yes=True, use_sudo=True, verbose=True):
       use_sudo (bool): If `True`, will use `sudo` instead of `run`.
         (Default: `True`)
       verbose (bool): If `False`, hide all output. (Default: `True`)
+      config (dict): Apt configuration options to set, e.g.
+        `{'Acquire::http::Dl-Limit': 500}`.
     """
     if assume_yes:
         yes = '--yes'
@@ -116,6 +157,8 @@ def dist_upgrade(assume_yes=True, use_sudo=True, verbose=True):
 
     func = use_sudo and sudo or run
     cmd = 'apt-get dist-upgrade {0}'.format(yes)
+    if config:
+        cmd += ' ' + ' '.join(_config_options(config))
 
     return _run_cmd(func, cmd, verbose)
 
@@ -266,9 +309,11 @@ def reboot_required(use_sudo=False, verbose=False):
         (Default: `False`)
       verbose (bool): If `False`, hide all output. (Default: `False`)
     """
-    return exists('/var/run/reboot-required',
-                  use_sudo=use_sudo,
-                  verbose=verbose)
+    def query():
+        return exists('/var/run/reboot-required',
+                      use_sudo=use_sudo,
+                      verbose=verbose)
+    return cache.cached('test -e /var/run/reboot-required', query)
 
 
 def installed(package, use_sudo=True):
@@ -284,17 +329,120 @@ def installed(package, use_sudo=True):
     """
     func = use_sudo and sudo or run
     cmd = "dpkg -s {0}".format(package)
-    with settings(warn_only=True):
-        installed = _run_cmd(func, cmd, verbose=False)
-    if installed.find("install ok installed") > -1:
-        return True
-    return False
 
+    def query():
+        with settings(warn_only=True):
+            installed = _run_cmd(func, cmd, verbose=False)
+        if installed.find("install ok installed") > -1:
+            return True
+        return False
+    return cache.cached(cmd, query)
 
-def check_version_available(package, version):
-    output = run("apt-cache madison {}".format(package), quiet=True).split("\n")
+
+def installed_packages(use_sudo=False):
+    """
+    List every installed package and its version in a single call.
+
+    Returns a dict mapping package names to versions. Raises `RuntimeError`
+    if the packages could not be listed.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    func = use_sudo and sudo or run
+
+    def query():
+        with settings(warn_only=True):
+            output = _run_cmd(func, INSTALLED_PACKAGES_CMD, verbose=False)
+        if output.failed:
+            raise RuntimeError('dpkg-query failed with status {0}'.format(
+                output.return_code))
+        return parse_installed_packages(output)
+    return cache.cached(INSTALLED_PACKAGES_CMD, query)
+
+
+def parse_installed_packages(output):
+    """
+    Parse the output of the `dpkg-query` call made by `installed_packages`.
+
+    Returns a dict mapping the names of installed packages to versions.
+
+    Args:
+      output (str): Lines of status, package name and version separated by
+        tabs.
+    """
+    packages = {}
+    for line in output.splitlines():
+        parts = line.strip().split('\t')
+        if len(parts) != 3:
+            continue
+        status, name, version = parts
+        # The second letter of the abbreviated status is the current state.
+        if status[1:2] == 'i':
+            packages[name] = version
+    return packages
+
+
+def available_versions(package):
+    """
+    List the versions of a package available from the configured sources.
+
+    Returns a list of versions, newest first.
+
+    Args:
+      package (str): The package name.
+    """
+    cmd = "apt-cache madison {}".format(package)
+
+    def query():
+        return parse_available_versions(run(cmd, quiet=True))
+    return cache.cached(cmd, query)
+
+
+def parse_available_versions(output):
+    """
+    Parse the output of `apt-cache madison`.
+
+    Returns a list of the distinct versions, in the order listed.
+
+    Args:
+      output (str): Lines of package, version and source separated by `|`.
+    """
     versions = []
-    for line in output:
+    for line in output.split("\n"):
         parts = line.split("|", 2)
-        versions.append(parts[1].strip())
-    return version in versions
+        if len(parts) < 2:
+            continue
+        version = parts[1].strip()
+        if version not in versions:
+            versions.append(version)
+    return versions
+
+
+def check_version_available(package, version):
+    return version in available_versions(package)
+
+
+def download_package_lists(local_path, use_sudo=False, verbose=False):
+    """
+    Download Apt's `Packages` index files from the remote host.
+
+    The files can be loaded into a
+    `fabric_package_management.index.PackageIndex` to answer availability
+    questions locally for any number of identical hosts.
+
+    Returns the list of local paths that were written.
+
+    Args:
+      local_path (str): The local directory to download the files to.
+      use_sudo (bool): If `True`, will use `sudo` to read the files.
+        (Default: `False`)
+      verbose (bool): If `False`, hide all output. (Default: `False`)
+    """
+    remote_path = '/var/lib/apt/lists/*_Packages'
+    local_path = os.path.join(local_path, '%(basename)s')
+    if verbose:
+        return get(remote_path, local_path, use_sudo=use_sudo)
+    with settings(hide('everything')):
+        return get(remote_path, local_path, use_sudo=use_sudo)
@@ -0,0 +1,284 @@
+"""
+Opt-in caching of read-only queries.
+
+Once a cache is enabled with `enable()`, the results of read-only calls such
+as `apt.installed()`, `apt.installed_packages()`,
+`apt.check_version_available()` and `apt.reboot_required()` are cached by
+host string and the remote command they run. Entries expire after a TTL and
+the least recently used entries are evicted first. Any command that can
+change a host's packages, such as `apt.install()`, drops that host's entries.
+
+`MemoryCache` is private to a process, so entries dropped by a `fleet`
+worker are only dropped from the worker's copy. `fleet.run` therefore drops
+the entries of every host it ran on from a `MemoryCache` in the calling
+process too. `DiskCache` stores entries in a SQLite file that several
+processes, such as the `fleet` workers, share.
+"""
+import collections
+import hashlib
+import json
+import os
+import time
+
+from fabric_package_management._fabric import env
+
+
+_active = None
+
+
+def _key(host, command):
+    """
+    The content address of a cache entry.
+    """
+    data = u'{0}\0{1}'.format(host, command).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class Cache(object):
+    """
+    Base class of the caches, keeping hit and miss counts.
+
+    `shared` is `True` for caches that all processes see the same entries
+    of.
+
+    Args:
+      ttl (float): Seconds an entry stays valid. (Default: `300`)
+      max_entries (int): The most entries kept before the least recently
+        used are evicted. (Default: `10000`)
+    """
+
+    shared = False
+
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Returns a dict of the `hits`, `misses` and current `entries`.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(self)}
+
+    def lookup(self, host, command):
+        """
+        Returns a tuple of `(found, value)` and counts the hit or miss.
+
+        Args:
+          host (str): The host string.
+          command (str): The command the value was produced by.
+        """
+        found, value = self.get(host, command)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found, value
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def get(self, host, command):
+        raise NotImplementedError
+
+    def set(self, host, command, value):
+        raise NotImplementedError
+
+    def invalidate(self, host=None):
+        raise NotImplementedError
+
+
+class MemoryCache(Cache):
+    """
+    An in-process LRU cache.
+
+    Values must be JSON serializable. They are stored serialized, like in
+    `DiskCache`, so changing a returned value never changes the cache.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        super(MemoryCache, self).__init__(ttl, max_entries)
+        # Keys mapped to (host, expires, value), least recently used first.
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, host, command):
+        key = _key(host, command)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False, None
+        if entry[1] < time.time():
+            return False, None
+        self._entries[key] = entry
+        return True, json.loads(entry[2])
+
+    def set(self, host, command, value):
+        key = _key(host, command)
+        self._entries.pop(key, None)
+        self._entries[key] = (host, time.time() + self.ttl, json.dumps(value))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, host=None):
+        if host is None:
+            self._entries.clear()
+            return
+        for key in [key for key, entry in self._entries.items()
+                    if entry[0] == host]:
+            del self._entries[key]
+
+
+class DiskCache(Cache):
+    """
+    An LRU cache stored in a SQLite file shared between processes.
+
+    Values must be JSON serializable.
+
+    Args:
+      path (str): The SQLite database file.
+      ttl (float): Seconds an entry stays valid. (Default: `300`)
+      max_entries (int): The most entries kept before the least recently
+        used are evicted. (Default: `10000`)
+    """
+
+    shared = True
+
+    def __init__(self, path, ttl=300, max_entries=10000):
+        super(DiskCache, self).__init__(ttl, max_entries)
+        self.path = path
+        self._db = None
+        self._pid = None
+
+    def _connection(self):
+        # SQLite connections must not be shared with forked children.
+        if self._db is None or self._pid != os.getpid():
+            # Imported here to keep importing the backends cheap.
+            import sqlite3
+            self._db = sqlite3.connect(self.path, timeout=30)
+            self._pid = os.getpid()
+            with self._db:
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS cache ('
+                    'key TEXT PRIMARY KEY, host TEXT, expires REAL, '
+                    'used REAL, value TEXT)')
+                self._db.execute(
+                    'CREATE INDEX IF NOT EXISTS cache_host ON cache (host)')
+        return self._db
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def get(self, host, command):
+        db = self._connection()
+        key = _key(host, command)
+        now = time.time()
+        row = db.execute('SELECT expires, value FROM cache WHERE key = ?',
+                         (key,)).fetchone()
+        if row is None or row[0] < now:
+            return False, None
+        with db:
+            db.execute('UPDATE cache SET used = ? WHERE key = ?', (now, key))
+        return True, json.loads(row[1])
+
+    def set(self, host, command, value):
+        db = self._connection()
+        now = time.time()
+        with db:
+            db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                       (_key(host, command), host, now + self.ttl, now,
+                        json.dumps(value)))
+            db.execute('DELETE FROM cache WHERE expires < ?', (now,))
+            db.execute('DELETE FROM cache WHERE key IN ('
+                       'SELECT key FROM cache ORDER BY used DESC '
+                       'LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def invalidate(self, host=None):
+        db = self._connection()
+        with db:
+            if host is None:
+                db.execute('DELETE FROM cache')
+            else:
+                db.execute('DELETE FROM cache WHERE host = ?', (host,))
+
+
+def enable(cache=None):
+    """
+    Start caching read-only queries.
+
+    Returns the cache in use.
+
+    Args:
+      cache (Cache): The cache to use. (Default: a new `MemoryCache`)
+    """
+    global _active
+    _active = cache if cache is not None else MemoryCache()
+    return _active
+
+
+def disable():
+    """
+    Stop caching read-only queries.
+    """
+    global _active
+    _active = None
+
+
+def active():
+    """
+    Returns the cache in use, or `None` if caching is disabled.
+    """
+    return _active
+
+
+def cached(command, query):
+    """
+    Return the cached result of a read-only command on the current host, or
+    call `query` and cache what it returns.
+
+    Args:
+      command (str): The remote command `query` runs.
+      query (callable): Runs the command and returns its parsed result.
+    """
+    cache = _active
+    if cache is None:
+        return query()
+    host = env.host_string
+    found, value = cache.lookup(host, command)
+    if found:
+        return value
+    value = query()
+    cache.set(host, command, value)
+    return value
+
+
+def invalidate(host=None):
+    """
+    Drop the cached entries of a host after it was changed.
+
+    Args:
+      host (str): The host string. (Default: the current host)
+    """
+    cache = _active
+    if cache is not None:
+        cache.invalidate(host or env.host_string)
+
+
+def invalidate_forked(host):
+    """
+    Drop the cached entries of a host after a forked process, such as a
+    `fleet` worker, ran commands on it.
+
+    Only a cache private to this process needs this, a shared cache already
+    saw the worker drop its entries.
+
+    Args:
+      host (str): The host string.
+    """
+    cache = _active
+    if cache is not None and not cache.shared:
+        cache.invalidate(host)
@@ -0,0 +1,172 @@
+"""
+Resumable fleet operations.
+
+A `Journal` durably records the outcome of an operation on each host in a
+local file, one JSON object per line. If the orchestrating process dies, the
+operation can be run again with the same journal and only the hosts that have
+not yet succeeded are attempted.
+"""
+import json
+import os
+import time
+
+from fabric_package_management import fleet
+
+
+def _format_arg(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return ' '.join(_format_arg(item) for item in value)
+    return json.dumps(value, sort_keys=True)
+
+
+def operation_name(func, args=(), kwargs=None):
+    """
+    Returns the name an operation is journaled under, e.g. `apt.upgrade` or
+    `apt.install htop git use_sudo=false`.
+
+    The arguments are part of the name, so that running the same function
+    with other arguments, such as other packages, is journaled separately.
+
+    Args:
+      func (callable): The function run on each host.
+      args (tuple): Positional arguments for `func`.
+      kwargs (dict): Keyword arguments for `func`.
+    """
+    module = func.__module__.rsplit('.', 1)[-1]
+    parts = ['{0}.{1}'.format(module, func.__name__)]
+    parts.extend(_format_arg(arg) for arg in args)
+    parts.extend('{0}={1}'.format(key, _format_arg(value))
+                 for key, value in sorted((kwargs or {}).items()))
+    return ' '.join(part for part in parts if part)
+
+
+class Journal(object):
+    """
+    An append-only journal of host results.
+
+    Every entry is flushed and synced to disk before the next host's result
+    is handled. A partially written last line, left behind by a crash, is
+    ignored when the journal is read back.
+
+    Args:
+      path (str): The journal file. It is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._succeeded = {}
+        complete = self._load()
+        self._file = open(path, 'a')
+        if not complete:
+            # Start after a line cut short by a crash.
+            self._file.write('\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the journal file.
+        """
+        self._file.close()
+
+    def record(self, operation, result):
+        """
+        Append the result of an operation on a host.
+
+        Args:
+          operation (str): The operation name, e.g. `apt.upgrade`.
+          result (fleet.HostResult): The host's result. Any object with
+            `host`, `succeeded`, `error` and `elapsed` attributes, such as a
+            `rollout.HostStatus`, can be recorded.
+        """
+        entry = {
+            'host': result.host,
+            'operation': operation,
+            'succeeded': bool(result.succeeded),
+            'error': result.error,
+            'elapsed': result.elapsed,
+            'timestamp': time.time(),
+        }
+        self._file.write(json.dumps(entry, sort_keys=True) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._update(entry)
+
+    def succeeded(self, operation):
+        """
+        Returns the set of hosts on which an operation succeeded.
+
+        Args:
+          operation (str): The operation name.
+        """
+        return set(host for host, ok in self._succeeded.get(
+            operation, {}).items() if ok)
+
+    def failed(self, operation):
+        """
+        Returns the set of hosts on which an operation last failed.
+
+        Args:
+          operation (str): The operation name.
+        """
+        return set(host for host, ok in self._succeeded.get(
+            operation, {}).items() if not ok)
+
+    def pending(self, hosts, operation):
+        """
+        Returns the hosts, in order, that have not yet succeeded.
+
+        Args:
+          hosts (list): The hosts the operation should run on.
+          operation (str): The operation name.
+        """
+        done = self.succeeded(operation)
+        return [host for host in hosts if host not in done]
+
+    def run(self, hosts, func, operation=None, **kwargs):
+        """
+        Run an operation through `fleet.run` on the pending hosts only.
+
+        Yields and records a `fleet.HostResult` per host attempted.
+
+        Args:
+          hosts (list): The hosts the operation should run on.
+          func (callable): The module level function to run on each host.
+          operation (str): The name to journal the operation under.
+            (Default: derived from `func` and its arguments, e.g.
+            `apt.install htop`)
+          **kwargs: Any other `fleet.run` arguments.
+        """
+        operation = operation or operation_name(
+            func, kwargs.get('args', ()), kwargs.get('kwargs'))
+        for result in fleet.run(self.pending(hosts, operation), func,
+                                **kwargs):
+            self.record(operation, result)
+            yield result
+
+    def _load(self):
+        """
+        Read the existing entries. Returns `False` if the last line is
+        incomplete.
+        """
+        if not os.path.exists(self.path):
+            return True
+        line = '\n'
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._update(entry)
+        return line.endswith('\n')
+
+    def _update(self, entry):
+        hosts = self._succeeded.setdefault(entry['operation'], {})
+        hosts[entry['host']] = entry['succeeded']
@@ -0,0 +1,174 @@
+"""
+The `fab-pkg` command line tool.
+
+Runs an Apt operation on every host in a host list file through
+`fleet.run` and prints one JSON object per line for each host as it
+finishes, e.g.::
+
+    fab-pkg --hosts hosts.txt --concurrency 50 install htop git
+"""
+import argparse
+import json
+import sys
+import time
+
+from fabric_package_management import apt, checkpoint, fleet, throttle
+
+
+# Operation names mapped to the function to run, whether it takes a list of
+# packages and whether it takes the `verbose` argument.
+OPERATIONS = {
+    'update': (apt.update, False, True),
+    'upgrade': (apt.upgrade, False, True),
+    'dist-upgrade': (apt.dist_upgrade, False, True),
+    'install': (apt.install, True, True),
+    'remove': (apt.remove, True, True),
+    'autoremove': (apt.autoremove, False, True),
+    'clean': (apt.clean, False, True),
+    'autoclean': (apt.autoclean, False, True),
+    'installed-packages': (apt.installed_packages, False, False),
+    'reboot-required': (apt.reboot_required, False, True),
+}
+
+# Operations whose functions accept the `config` argument set by a throttle.
+_THROTTLED = ('update', 'upgrade', 'dist-upgrade', 'install')
+
+
+def read_hosts(f):
+    """
+    Read host strings from a file, one per line.
+
+    Blank lines and lines starting with `#` are skipped.
+
+    Args:
+      f (file): The open host list file.
+    """
+    hosts = []
+    for line in f:
+        line = line.split('#', 1)[0].strip()
+        if line:
+            hosts.append(line)
+    return hosts
+
+
+def parser():
+    """
+    Returns the `argparse.ArgumentParser` for `fab-pkg`.
+    """
+    p = argparse.ArgumentParser(
+        prog='fab-pkg',
+        description='Run an Apt operation on many hosts in parallel and '
+                    'print one JSON line per host.')
+    p.add_argument('operation', choices=sorted(OPERATIONS),
+                   help='The operation to run.')
+    p.add_argument('packages', nargs='*',
+                   help='The packages to install or remove.')
+    p.add_argument('-H', '--hosts', required=True,
+                   type=argparse.FileType('r'),
+                   help='File with one host string per line, or - for stdin.')
+    p.add_argument('-c', '--concurrency', type=int, default=10,
+                   help='The number of hosts to run at once. (Default: 10)')
+    p.add_argument('-u', '--user', help='The user to connect as.')
+    p.add_argument('-i', '--identity', action='append',
+                   help='An SSH private key file. Can be given many times.')
+    p.add_argument('--no-sudo', action='store_true',
+                   help='Run commands with run instead of sudo.')
+    p.add_argument('--output', action='store_true',
+                   help="Include each host's command output.")
+    p.add_argument('--journal',
+                   help='Checkpoint journal file. Hosts that already '
+                        'succeeded in it with the same operation and '
+                        'arguments are skipped.')
+    p.add_argument('--max-hosts-per-mirror', type=int,
+                   help='Throttle downloads to this many hosts at once for '
+                        'update, upgrade, dist-upgrade and install.')
+    return p
+
+
+def _line(operation, result, output):
+    entry = {
+        'host': result.host,
+        'operation': operation,
+        'succeeded': result.succeeded,
+        'return_code': result.return_code,
+        'error': result.error,
+        'elapsed': round(result.elapsed, 3),
+    }
+    if isinstance(result.value, str):
+        if output:
+            entry['output'] = result.value
+    elif result.value is not None:
+        entry['result'] = result.value
+    return json.dumps(entry, sort_keys=True)
+
+
+def main(argv=None, stdout=None):
+    """
+    Entry point of `fab-pkg`.
+
+    Returns `0` if the operation succeeded on every host, `1` otherwise.
+
+    Args:
+      argv (list): The command line arguments. (Default: `sys.argv[1:]`)
+      stdout (file): Where to write the JSON lines as text.
+        (Default: `sys.stdout`)
+    """
+    p = parser()
+    args = p.parse_args(argv)
+    stdout = stdout or sys.stdout
+
+    func, takes_packages, takes_verbose = OPERATIONS[args.operation]
+    if takes_packages and not args.packages:
+        p.error('{0} needs at least one package'.format(args.operation))
+    if args.packages and not takes_packages:
+        p.error('{0} does not take packages'.format(args.operation))
+
+    with args.hosts:
+        hosts = read_hosts(args.hosts)
+
+    fn_args = (args.packages,) if takes_packages else ()
+    fn_kwargs = {'use_sudo': not args.no_sudo}
+    if takes_verbose:
+        fn_kwargs['verbose'] = False
+
+    env = {'abort_on_prompts': True}
+    if args.user:
+        env['user'] = args.user
+    if args.identity:
+        env['key_filename'] = args.identity
+
+    run_kwargs = {'args': fn_args, 'kwargs': fn_kwargs,
+                  'pool_size': args.concurrency, 'env': env}
+    if args.max_hosts_per_mirror and args.operation in _THROTTLED:
+        run_kwargs['throttle'] = throttle.Throttle(
+            max_hosts=args.max_hosts_per_mirror)
+
+    journal = None
+    if args.journal:
+        journal = checkpoint.Journal(args.journal)
+        results = journal.run(hosts, func, **run_kwargs)
+    else:
+        results = fleet.run(hosts, func, **run_kwargs)
+
+    start = time.time()
+    failed = 0
+    count = 0
+    try:
+        for result in results:
+            count += 1
+            if not result.succeeded:
+                failed += 1
+            stdout.write(u'{0}\n'.format(
+                _line(args.operation, result, args.output)))
+            stdout.flush()
+    finally:
+        if journal is not None:
+            journal.close()
+
+    sys.stderr.write('{0}: {1} hosts, {2} failed in {3:.1f}s\n'.format(
+        args.operation, count, failed, time.time() - start))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
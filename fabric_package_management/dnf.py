@@ -0,0 +1,236 @@
+from fabric_package_management import cache
+from fabric_package_management._fabric import hide, run, settings, sudo
+
+#: Lists the name and `[epoch:]version-release` of every installed package.
+INSTALLED_PACKAGES_CMD = ("rpm -qa --qf "
+                          "'%{NAME}\\t%{EPOCH}\\t%{VERSION}-%{RELEASE}\\n'")
+
+
+def _run_cmd(func, cmd, verbose):
+    """
+    Utility function to run commands respecting `use_sudo` and `verbose`.
+    """
+    changes = not cmd.startswith('rpm ')
+    if changes:
+        # Package changes drop the host's cached queries, before and after
+        # the command runs.
+        cache.invalidate()
+    try:
+        if verbose:
+            return func(cmd)
+        with settings(hide('everything')):
+            return func(cmd)
+    finally:
+        if changes:
+            cache.invalidate()
+
+
+def _binary(use_yum):
+    return use_yum and 'yum' or 'dnf'
+
+
+def _packages(packages):
+    if not isinstance(packages, str):
+        packages = ' '.join(packages)
+    return packages
+
+
+def install(packages, assume_yes=True, use_sudo=True, verbose=True,
+            use_yum=False):
+    """
+    Install packages on the remote host via DNF.
+
+    Args:
+      packages (list or str): The packages to install.
+      assume_yes (bool): If `True`, DNF will assume "yes" as answer to all
+        prompts and run non-interactively. (Default: `True`)
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+      use_yum (bool): If `True`, will use `yum` instead of `dnf`.
+        (Default: `False`)
+    """
+    if assume_yes:
+        yes = '--assumeyes'
+    else:
+        yes = ''
+
+    func = use_sudo and sudo or run
+    cmd = '{0} install {1} {2}'.format(_binary(use_yum), yes,
+                                       _packages(packages))
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def remove(packages, assume_yes=True, use_sudo=True, verbose=True,
+           use_yum=False):
+    """
+    Remove a package or list of packages from the remote host.
+
+    Args:
+      packages (list or str): The packages to remove.
+      assume_yes (bool): If `True`, DNF will assume "yes" as answer to all
+        prompts and run non-interactively. (Default: `True`)
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+      use_yum (bool): If `True`, will use `yum` instead of `dnf`.
+        (Default: `False`)
+    """
+    if assume_yes:
+        yes = '--assumeyes'
+    else:
+        yes = ''
+
+    func = use_sudo and sudo or run
+    cmd = '{0} remove {1} {2}'.format(_binary(use_yum), yes,
+                                      _packages(packages))
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def update(use_sudo=True, verbose=True, use_yum=False):
+    """
+    Update the repository metadata cache on the remote host.
+
+    Unlike `dnf update`, which is an alias of `upgrade`, this only refreshes
+    the metadata, like `apt.update`.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+      use_yum (bool): If `True`, will use `yum` instead of `dnf`.
+        (Default: `False`)
+    """
+    func = use_sudo and sudo or run
+    cmd = '{0} makecache'.format(_binary(use_yum))
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def upgrade(assume_yes=True, use_sudo=True, verbose=True, use_yum=False):
+    """
+    Install the newest versions of all packages on the remote host.
+
+    Args:
+      assume_yes (bool): If `True`, DNF will assume "yes" as answer to all
+        prompts and run non-interactively. (Default: `True`)
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `True`)
+      verbose (bool): If `False`, hide all output. (Default: `True`)
+      use_yum (bool): If `True`, will use `yum` instead of `dnf`.
+        (Default: `False`)
+    """
+    if assume_yes:
+        yes = '--assumeyes'
+    else:
+        yes = ''
+
+    func = use_sudo and sudo or run
+    cmd = '{0} upgrade {1}'.format(_binary(use_yum), yes)
+
+    return _run_cmd(func, cmd, verbose)
+
+
+def installed(package, use_sudo=False):
+    """
+    Check if a package is installed on the system.
+
+    Returns `True` if installed, `False` if it is not.
+
+    Args:
+      package (str): The package to check if installed.
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    func = use_sudo and sudo or run
+    cmd = 'rpm -q {0}'.format(package)
+
+    def query():
+        with settings(warn_only=True):
+            return _run_cmd(func, cmd, verbose=False).succeeded
+    return cache.cached(cmd, query)
+
+
+def installed_packages(use_sudo=False):
+    """
+    List every installed package and its version in a single call.
+
+    Returns a dict mapping package names to versions. Raises `RuntimeError`
+    if the packages could not be listed.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    func = use_sudo and sudo or run
+
+    def query():
+        with settings(warn_only=True):
+            output = _run_cmd(func, INSTALLED_PACKAGES_CMD, verbose=False)
+        if output.failed:
+            raise RuntimeError('rpm -qa failed with status {0}'.format(
+                output.return_code))
+        return parse_installed_packages(output)
+    return cache.cached(INSTALLED_PACKAGES_CMD, query)
+
+
+def parse_installed_packages(output):
+    """
+    Parse the output of the `rpm` call made by `installed_packages`.
+
+    Returns a dict mapping package names to `[epoch:]version-release`.
+
+    Args:
+      output (str): Lines of name, epoch and version separated by tabs.
+    """
+    packages = {}
+    for line in output.splitlines():
+        parts = line.strip().split('\t')
+        if len(parts) != 3:
+            continue
+        name, epoch, version = parts
+        if epoch not in ('(none)', '0'):
+            version = '{0}:{1}'.format(epoch, version)
+        packages[name] = version
+    return packages
+
+
+def available_versions(package, use_yum=False):
+    """
+    List the versions of a package available from the enabled repositories.
+
+    Returns a list of `version-release` strings, in the order listed.
+
+    Args:
+      package (str): The package name.
+      use_yum (bool): If `True`, will use `yum` instead of `dnf`.
+        (Default: `False`)
+    """
+    cmd = '{0} --quiet list --showduplicates available {1}'.format(
+        _binary(use_yum), package)
+
+    def query():
+        return parse_available_versions(run(cmd, quiet=True), package)
+    return cache.cached(cmd, query)
+
+
+def parse_available_versions(output, package):
+    """
+    Parse the output of `dnf list --showduplicates available`.
+
+    Returns a list of the distinct versions of `package`.
+
+    Args:
+      output (str): Lines of `name.arch`, version and repository.
+      package (str): The package name.
+    """
+    versions = []
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) != 3 or parts[0].rsplit('.', 1)[0] != package:
+            continue
+        if parts[1] not in versions:
+            versions.append(parts[1])
+    return versions
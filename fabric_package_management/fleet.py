@@ -0,0 +1,140 @@
+"""
+Run a function against many hosts concurrently.
+
+Fabric's environment is global to the process, so like Fabric's own
+`@parallel` this uses a pool of worker processes, one host at a time per
+worker. Results are yielded as soon as each host finishes.
+"""
+import collections
+import multiprocessing
+import time
+
+try:
+    from queue import Empty, Queue
+except ImportError:  # Python 2
+    from Queue import Empty, Queue
+
+from fabric_package_management import cache
+from fabric_package_management._fabric import disconnect_all, settings
+
+
+HostResult = collections.namedtuple(
+    'HostResult',
+    ['host', 'succeeded', 'value', 'return_code', 'error', 'elapsed'])
+
+
+def _call(task):
+    host, func, args, kwargs, env = task
+    start = time.time()
+    try:
+        with settings(host_string=host, warn_only=True, **env):
+            value = func(*args, **kwargs)
+    except (Exception, SystemExit) as e:
+        # Fabric aborts with SystemExit, e.g. when a host is unreachable.
+        return HostResult(host, False, None, None, str(e) or repr(e),
+                          time.time() - start)
+    finally:
+        disconnect_all()
+
+    succeeded = getattr(value, 'succeeded', True)
+    return_code = getattr(value, 'return_code', None)
+    if return_code is not None:
+        # Return plain strings rather than Fabric's _AttributeString.
+        value = str(value)
+    error = None if succeeded else 'Exited with status {0}'.format(
+        return_code)
+    return HostResult(host, succeeded, value, return_code, error,
+                      time.time() - start)
+
+
+def _merge_kwargs(kwargs, extra):
+    """
+    Add the keyword arguments from a throttle to the caller's, merging their
+    `config` dicts. The throttle's options win when both set the same one.
+    """
+    merged = dict(kwargs, **extra)
+    if kwargs.get('config') and extra.get('config'):
+        merged['config'] = dict(kwargs['config'], **extra['config'])
+    return merged
+
+
+def run(hosts, func, args=(), kwargs=None, pool_size=None, env=None,
+        throttle=None):
+    """
+    Call `func` once for each host, in parallel.
+
+    Yields a `HostResult` per host in the order they complete. Commands run
+    with `warn_only` set, so a failing command or an unreachable host is
+    reported in its result instead of aborting the other hosts. The entries
+    of each host are dropped from an enabled `cache.MemoryCache`, as changes
+    made by the workers cannot reach it.
+
+    Args:
+      hosts (list): The host strings to run against. A host listed more
+        than once is only run once, at its first position.
+      func (callable): A module level function, e.g. `apt.update`. It must
+        be picklable to be sent to the worker processes.
+      args (tuple): Positional arguments for `func`.
+      kwargs (dict): Keyword arguments for `func`.
+      pool_size (int): The number of hosts to run at once.
+        (Default: the number of hosts)
+      env (dict): Extra Fabric settings, such as `user` or
+        `key_filename`, applied around each call.
+      throttle (object): Optionally gates when each host starts, such as a
+        `throttle.Throttle`. Its `acquire(host)` returns extra keyword
+        arguments for `func`, or `None` if the host has to wait, and
+        `release(result)` is called as each host finishes. A `config`
+        dict it returns is merged into the one in `kwargs`.
+    """
+    hosts = list(collections.OrderedDict.fromkeys(hosts))
+    if not hosts:
+        return
+    kwargs = kwargs or {}
+    env = env or {}
+    pool_size = min(pool_size or len(hosts), len(hosts))
+    pool = multiprocessing.Pool(pool_size)
+    done = Queue()
+    running = {}
+    try:
+        while hosts or running:
+            for host in list(hosts):
+                if len(running) >= pool_size:
+                    break
+                extra = throttle.acquire(host) if throttle else {}
+                if extra is None:
+                    continue
+                hosts.remove(host)
+                task_kwargs = _merge_kwargs(kwargs, extra)
+                task = (host, func, tuple(args), task_kwargs, env)
+                running[host] = pool.apply_async(_call, (task,),
+                                                 callback=done.put)
+            if not running:
+                raise RuntimeError('The throttle did not let any host start')
+            result = _wait(done, running)
+            del running[result.host]
+            cache.invalidate_forked(result.host)
+            if throttle:
+                throttle.release(result)
+            yield result
+    except BaseException:
+        # Includes the generator being closed before all hosts finished.
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def _wait(done, running):
+    """
+    Wait for the next result, re-raising errors that happen outside of
+    `_call`, such as a function that cannot be pickled.
+    """
+    while True:
+        try:
+            return done.get(timeout=1)
+        except Empty:
+            for async_result in running.values():
+                if async_result.ready() and not async_result.successful():
+                    async_result.get()
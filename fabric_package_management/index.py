@@ -0,0 +1,341 @@
+"""
+Local parsing of Debian `Packages` index files.
+
+A `PackageIndex` answers availability and dependency questions on the
+control node, so that many identical hosts can be planned for without an
+`apt-cache` round trip to each of them.
+"""
+import bz2
+import collections
+import gzip
+import re
+
+try:
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
+
+try:
+    from sys import intern
+except ImportError:  # Python 2
+    pass
+
+from fabric_package_management import version as _version
+
+
+Package = collections.namedtuple(
+    'Package', ['name', 'version', 'architecture', 'depends', 'provides'])
+
+# Only these fields are kept, everything else in a stanza is skipped while
+# streaming so that long descriptions never get decoded.
+_FIELDS = {
+    b'Package': 'name',
+    b'Version': 'version',
+    b'Architecture': 'architecture',
+    b'Pre-Depends': 'pre_depends',
+    b'Depends': 'depends',
+    b'Provides': 'provides',
+}
+
+_RELATION = re.compile(
+    r'^\s*([^\s:(\[<]+)(?::\w+)?\s*(?:\(\s*([<>=]+)\s*([^\s)]+)\s*\))?')
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.BZ2File(path, 'rb')
+    if path.endswith('.xz') and lzma is not None:
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def iter_stanzas(fileobj):
+    """
+    Stream the stanzas of a `Packages` file.
+
+    Yields a dict per package holding only the fields used by
+    `PackageIndex`. The file is read line by line and never loaded whole.
+
+    Args:
+      fileobj (file): A file object opened in binary mode.
+    """
+    stanza = {}
+    key = None
+    for line in fileobj:
+        if line[:1] in (b' ', b'\t'):
+            # Continuation of a multi-line field.
+            if key is not None:
+                stanza[key] += ' ' + line.strip().decode('utf-8', 'replace')
+            continue
+        line = line.rstrip()
+        if not line:
+            if stanza:
+                yield stanza
+            stanza = {}
+            key = None
+            continue
+        field, _, value = line.partition(b':')
+        key = _FIELDS.get(field)
+        if key is not None:
+            stanza[key] = value.strip().decode('utf-8', 'replace')
+    if stanza:
+        yield stanza
+
+
+def parse_relations(field):
+    """
+    Parse a `Depends` style field.
+
+    Returns a list of groups of alternatives, where each alternative is a
+    tuple of `(name, operator, version)`. `operator` and `version` are
+    `None` for unversioned relations.
+
+    Args:
+      field (str): The raw field value, e.g. `libc6 (>= 2.14), awk | mawk`.
+    """
+    groups = []
+    if not field:
+        return groups
+    for group in field.split(','):
+        alternatives = []
+        for alternative in group.split('|'):
+            match = _RELATION.match(alternative)
+            if match is None:
+                continue
+            alternatives.append(match.groups())
+        if alternatives:
+            groups.append(tuple(alternatives))
+    return groups
+
+
+class PackageIndex(object):
+    """
+    An in-memory index of the packages described by `Packages` files.
+
+    Names, versions and architectures are interned, and each package is
+    stored as a small tuple with its relations kept as the raw field string
+    until they are needed. The entries of each name are kept newest first as
+    they are added, so lookups never sort.
+    """
+
+    def __init__(self):
+        self._packages = {}
+        self._providers = {}
+
+    @classmethod
+    def from_files(cls, paths):
+        """
+        Build an index from several `Packages` files.
+
+        Args:
+          paths (list): Paths to `Packages`, `Packages.gz`, `Packages.bz2` or
+            `Packages.xz` files.
+        """
+        index = cls()
+        for path in paths:
+            index.load(path)
+        return index
+
+    def load(self, path):
+        """
+        Add the packages from a `Packages` file to the index.
+
+        Returns the number of stanzas read.
+
+        Args:
+          path (str): Path to a, possibly compressed, `Packages` file.
+        """
+        count = 0
+        with _open(path) as f:
+            for stanza in iter_stanzas(f):
+                self.add(stanza)
+                count += 1
+        return count
+
+    def add(self, stanza):
+        """
+        Add a single package stanza, as yielded by `iter_stanzas`.
+
+        A version that is already known for the same architecture is skipped.
+
+        Args:
+          stanza (dict): The parsed fields of the package.
+        """
+        name = intern(str(stanza['name']))
+        package_version = intern(str(stanza.get('version', '')))
+        architecture = intern(str(stanza.get('architecture', '')))
+        depends = ', '.join(
+            field for field in (stanza.get('pre_depends'),
+                                stanza.get('depends')) if field) or None
+        provides = stanza.get('provides') or None
+
+        entries = self._packages.get(name, ())
+        position = len(entries)
+        for i, entry in enumerate(entries):
+            order = _version.compare(package_version, entry.version)
+            if order == 0 and entry.architecture == architecture:
+                return
+            if order > 0 and position == len(entries):
+                position = i
+        package = Package(name, package_version, architecture, depends,
+                          provides)
+        self._packages[name] = (entries[:position] + (package,) +
+                                entries[position:])
+
+        for group in parse_relations(provides):
+            virtual = intern(str(group[0][0]))
+            providers = self._providers.get(virtual, ())
+            if name not in providers:
+                self._providers[virtual] = providers + (name,)
+
+    def __len__(self):
+        return len(self._packages)
+
+    def __contains__(self, name):
+        return name in self._packages or name in self._providers
+
+    def names(self):
+        """
+        Returns an iterator over the names of all real packages.
+        """
+        return iter(self._packages)
+
+    def packages(self, name, architecture=None):
+        """
+        Returns all the entries for a package, newest version first.
+
+        Args:
+          name (str): The package name.
+          architecture (str): If set, only entries for this architecture or
+            `all` are returned.
+        """
+        entries = self._packages.get(name, ())
+        if architecture is None:
+            return list(entries)
+        return [package for package in entries
+                if package.architecture in (architecture, 'all')]
+
+    def versions(self, name):
+        """
+        Returns the distinct versions of a package, newest first.
+
+        Args:
+          name (str): The package name.
+        """
+        versions = []
+        for package in self.packages(name):
+            if package.version not in versions:
+                versions.append(package.version)
+        return versions
+
+    def providers(self, name):
+        """
+        Returns the names of the packages that provide a virtual package.
+
+        Args:
+          name (str): The virtual package name.
+        """
+        return self._providers.get(name, ())
+
+    def candidate(self, name, operator=None, version=None,
+                  architecture=None):
+        """
+        Returns the newest entry of a package, or `None` if there is none.
+
+        Args:
+          name (str): The package name.
+          operator (str): An optional version relation such as `>=`.
+          version (str): The version the relation is checked against.
+          architecture (str): If set, only entries for this architecture or
+            `all` are considered.
+        """
+        for package in self.packages(name, architecture):
+            if (operator is None or
+                    _version.check(package.version, operator, version)):
+                return package
+        return None
+
+    def available(self, name, version=None):
+        """
+        Check if a package, or a given version of it, is available.
+
+        This answers the same question as `apt.check_version_available()`
+        without contacting a host.
+
+        Args:
+          name (str): The package name.
+          version (str): If set, the exact version to look for.
+        """
+        if version is None:
+            return name in self._packages
+        return version in self.versions(name)
+
+    def closure(self, names, architecture=None):
+        """
+        Resolve the dependency closure of a set of packages.
+
+        Each relation is satisfied by the newest matching version of the first
+        alternative that can be satisfied, falling back to the providers of
+        virtual packages. Conflicts are not taken into account, and without
+        an `architecture` entries of any architecture may be selected.
+
+        Returns a tuple of `(resolved, missing)` where `resolved` maps package
+        names to their selected `Package` and `missing` is a set of the
+        relations that could not be satisfied.
+
+        Args:
+          names (list or str): The packages to resolve.
+          architecture (str): If set, only packages for this architecture or
+            `all` are selected, e.g. `amd64`.
+        """
+        if isinstance(names, str):
+            names = [names]
+        resolved = {}
+        missing = set()
+        pending = [((name, None, None),) for name in names]
+        while pending:
+            group = pending.pop()
+            if any(self._satisfied(resolved, alt) for alt in group):
+                continue
+            package = None
+            for alternative in group:
+                package = self._select(architecture, *alternative)
+                if package is not None:
+                    break
+            if package is None:
+                missing.add(' | '.join(_format_relation(alt)
+                                       for alt in group))
+                continue
+            resolved[package.name] = package
+            pending.extend(parse_relations(package.depends))
+        return resolved, missing
+
+    def _select(self, architecture, name, operator, version):
+        package = self.candidate(name, operator, version, architecture)
+        if package is None and operator is None:
+            for provider in self.providers(name):
+                package = self.candidate(provider, architecture=architecture)
+                if package is not None:
+                    break
+        return package
+
+    def _satisfied(self, resolved, alternative):
+        name, operator, version = alternative
+        package = resolved.get(name)
+        if package is not None:
+            return (operator is None or
+                    _version.check(package.version, operator, version))
+        if operator is None:
+            return any(provider in resolved
+                       for provider in self.providers(name))
+        return False
+
+
+def _format_relation(alternative):
+    name, operator, version = alternative
+    if operator is None:
+        return name
+    return '{0} ({1} {2})'.format(name, operator, version)
+
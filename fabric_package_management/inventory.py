@@ -0,0 +1,413 @@
+"""
+Fleet wide inventory of installed packages.
+
+An `Inventory` stores the installed packages of many hosts compactly. Each
+distinct package name and version is stored once, each distinct
+`(name, version)` pair gets an integer id, and the package set of a host
+is stored as a shared base, a sorted array of pair ids, plus the small
+sorted arrays of the pair ids added to and removed from it. A new base is
+only started when a host differs from every existing base by more than a
+quarter of its packages, and hosts with the exact same set of packages
+share a single entry. As most hosts share most package versions, memory
+stays roughly flat as hosts are added.
+
+Sets and bases are reference counted, so replacing or removing hosts does
+not leave unused entries behind.
+"""
+import array
+import bisect
+import gzip
+import hashlib
+import json
+import os
+
+from fabric_package_management import apt, fleet
+from fabric_package_management import version as _version
+
+
+class Inventory(object):
+    """
+    Installed package versions for a set of hosts.
+    """
+
+    def __init__(self):
+        self._names = []
+        self._name_ids = {}
+        self._versions = []
+        self._version_ids = {}
+        self._pairs = []
+        self._pair_ids = {}
+        self._name_pairs = {}
+        # Base ids mapped to their sorted array of pair ids, and to the
+        # number of sets built on them.
+        self._bases = {}
+        self._base_refs = {}
+        # Set ids mapped to a tuple of (base id, added, removed), to their
+        # content digest and to the number of hosts holding them.
+        self._sets = {}
+        self._set_keys = {}
+        self._set_refs = {}
+        self._set_ids = {}
+        self._hosts = {}
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def __contains__(self, host):
+        return host in self._hosts
+
+    def hosts(self):
+        """
+        Returns a sorted list of the hosts in the inventory.
+        """
+        return sorted(self._hosts)
+
+    def add(self, host, packages):
+        """
+        Add or replace the packages of a host.
+
+        Args:
+          host (str): The host string.
+          packages (dict): Package names mapped to installed versions, as
+            returned by `apt.installed_packages()`.
+        """
+        ids = array.array('I', sorted(
+            self._pair_id(name, package_version)
+            for name, package_version in packages.items()))
+        key = hashlib.sha1(_bytes(ids)).digest()
+        set_id = self._set_ids.get(key)
+        if set_id is None:
+            set_id = self._new_set(key, ids)
+        self._set_refs[set_id] += 1
+        if host in self._hosts:
+            self._release(self._hosts[host])
+        self._hosts[host] = set_id
+
+    def remove(self, host):
+        """
+        Remove a host from the inventory.
+
+        Args:
+          host (str): The host string.
+        """
+        self._release(self._hosts.pop(host))
+
+    def collect(self, hosts, pool_size=10, use_sudo=False, env=None):
+        """
+        Collect the installed packages of hosts in parallel.
+
+        Each host is queried with a single `dpkg-query` call and added to the
+        inventory as soon as its result arrives.
+
+        Returns a list of the `fleet.HostResult` of the hosts that failed.
+
+        Args:
+          hosts (list): The host strings to query.
+          pool_size (int): The number of hosts to query at once.
+            (Default: `10`)
+          use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+            (Default: `False`)
+          env (dict): Extra Fabric settings for `fleet.run`.
+        """
+        failed = []
+        for result in fleet.run(hosts, apt.installed_packages,
+                                kwargs={'use_sudo': use_sudo},
+                                pool_size=pool_size, env=env):
+            if result.succeeded:
+                self.add(result.host, result.value)
+            else:
+                failed.append(result)
+        return failed
+
+    def packages(self, host):
+        """
+        Returns a dict of the packages installed on a host and their versions.
+
+        Args:
+          host (str): The host string.
+        """
+        return dict(self._pair(pair_id)
+                    for pair_id in self._ids(self._hosts[host]))
+
+    def version(self, host, package):
+        """
+        Returns the installed version of a package on a host, or `None`.
+
+        Args:
+          host (str): The host string.
+          package (str): The package name.
+        """
+        name_id = self._name_ids.get(package)
+        if name_id is None:
+            return None
+        set_id = self._hosts[host]
+        for pair_id in self._pair_ids_for(name_id):
+            if self._contains(set_id, pair_id):
+                return self._versions[self._pairs[pair_id][1]]
+        return None
+
+    def query(self, package, operator=None, version=None):
+        """
+        Find the hosts that have a package installed.
+
+        For example `query('openssl', '<<', '1.0.1f-1ubuntu2.27')` returns
+        every host with an older openssl.
+
+        Returns a dict mapping matching hosts to their installed version.
+
+        Args:
+          package (str): The package name.
+          operator (str): An optional version relation such as `<<`.
+          version (str): The version the relation is checked against.
+        """
+        if (operator is None) != (version is None):
+            raise ValueError('operator and version must be given together')
+        name_id = self._name_ids.get(package)
+        if name_id is None:
+            return {}
+        pair_ids = [
+            pair_id for pair_id in self._pair_ids_for(name_id)
+            if operator is None or _version.check(
+                self._versions[self._pairs[pair_id][1]], operator, version)]
+        if not pair_ids:
+            return {}
+
+        # Each base and each distinct package set is only searched once. A
+        # set holds at most one version of a package.
+        base_matches = {}
+        for base_id, ids in self._bases.items():
+            base_matches[base_id] = next(
+                (pair_id for pair_id in pair_ids if _contains(ids, pair_id)),
+                None)
+        matches = {}
+        for set_id, (base_id, added, removed) in self._sets.items():
+            match = next(
+                (pair_id for pair_id in pair_ids if _contains(added, pair_id)),
+                None)
+            if match is None:
+                match = base_matches[base_id]
+                if match is not None and _contains(removed, match):
+                    match = None
+            if match is not None:
+                matches[set_id] = self._versions[self._pairs[match][1]]
+        return dict((host, matches[set_id])
+                    for host, set_id in self._hosts.items()
+                    if set_id in matches)
+
+    def diff(self, host_a, host_b, other=None):
+        """
+        Compare the packages of two hosts.
+
+        Returns a dict mapping each package that differs to a tuple of
+        `(version_a, version_b)`, where a missing package is `None`.
+
+        Args:
+          host_a (str): The first host.
+          host_b (str): The second host, looked up in `other` if given.
+          other (Inventory): Another inventory, e.g. a later snapshot.
+        """
+        if other is None:
+            other = self
+        if other is self and self._hosts[host_a] == self._hosts[host_b]:
+            return {}
+        return _diff_packages(self.packages(host_a), other.packages(host_b))
+
+    def diff_snapshot(self, other):
+        """
+        Compare this inventory with a later snapshot.
+
+        Returns a dict mapping each host whose packages changed to a dict of
+        `{package: (old_version, new_version)}`. Hosts only present in one
+        snapshot are compared against an empty package list.
+
+        Args:
+          other (Inventory): The later snapshot.
+        """
+        changes = {}
+        cache = {}
+        for host in set(self._hosts) | set(other._hosts):
+            key = (self._hosts.get(host), other._hosts.get(host))
+            if key not in cache:
+                old = self.packages(host) if key[0] is not None else {}
+                new = other.packages(host) if key[1] is not None else {}
+                cache[key] = _diff_packages(old, new)
+            if cache[key]:
+                changes[host] = cache[key]
+        return changes
+
+    def save(self, path):
+        """
+        Write the inventory to a gzipped JSON file.
+
+        The file is written to a temporary path first and renamed into place.
+
+        Args:
+          path (str): The file to write.
+        """
+        data = {
+            'names': self._names,
+            'versions': self._versions,
+            'pairs': [i for pair in self._pairs for i in pair],
+            'bases': [[base_id, list(ids)]
+                      for base_id, ids in self._bases.items()],
+            'sets': [[set_id, base_id, list(added), list(removed)]
+                     for set_id, (base_id, added, removed)
+                     in self._sets.items()],
+            'hosts': self._hosts,
+        }
+        tmp = path + '.tmp'
+        with gzip.open(tmp, 'wb') as f:
+            f.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an inventory written by `save`.
+
+        Args:
+          path (str): The file to read.
+        """
+        with gzip.open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        inventory = cls()
+        inventory._names = data['names']
+        inventory._name_ids = dict(
+            (name, i) for i, name in enumerate(inventory._names))
+        inventory._versions = data['versions']
+        inventory._version_ids = dict(
+            (v, i) for i, v in enumerate(inventory._versions))
+        flat = data['pairs']
+        inventory._pairs = list(zip(flat[::2], flat[1::2]))
+        for pair_id, pair in enumerate(inventory._pairs):
+            inventory._pair_ids[pair] = pair_id
+            inventory._name_pairs.setdefault(pair[0], []).append(pair_id)
+        for base_id, ids in data['bases']:
+            inventory._bases[base_id] = array.array('I', ids)
+            inventory._base_refs[base_id] = 0
+        for set_id, base_id, added, removed in data['sets']:
+            inventory._sets[set_id] = (base_id, array.array('I', added),
+                                       array.array('I', removed))
+            inventory._base_refs[base_id] += 1
+            key = hashlib.sha1(_bytes(inventory._ids(set_id))).digest()
+            inventory._set_keys[set_id] = key
+            inventory._set_ids[key] = set_id
+            inventory._set_refs[set_id] = 0
+        inventory._hosts = data['hosts']
+        for set_id in inventory._hosts.values():
+            inventory._set_refs[set_id] += 1
+        ids = list(inventory._bases) + list(inventory._sets)
+        inventory._next_id = max(ids) + 1 if ids else 0
+        return inventory
+
+    def _new_set(self, key, ids):
+        """
+        Store a new package set against the closest base, starting a new
+        base if every existing one differs by more than a quarter.
+        """
+        members = set(ids)
+        best = None
+        for base_id, base in self._bases.items():
+            base_members = set(base)
+            added = members - base_members
+            removed = base_members - members
+            size = len(added) + len(removed)
+            if size <= len(ids) // 4 and (best is None or size < best[0]):
+                best = (size, base_id, added, removed)
+        if best is None:
+            base_id = self._take_id()
+            self._bases[base_id] = ids
+            self._base_refs[base_id] = 0
+            added = removed = ()
+        else:
+            _, base_id, added, removed = best
+        set_id = self._take_id()
+        self._sets[set_id] = (base_id, array.array('I', sorted(added)),
+                              array.array('I', sorted(removed)))
+        self._base_refs[base_id] += 1
+        self._set_keys[set_id] = key
+        self._set_ids[key] = set_id
+        self._set_refs[set_id] = 0
+        return set_id
+
+    def _release(self, set_id):
+        """
+        Drop a host's reference to a set, and the set and its base once
+        nothing uses them.
+        """
+        self._set_refs[set_id] -= 1
+        if self._set_refs[set_id]:
+            return
+        base_id = self._sets.pop(set_id)[0]
+        del self._set_refs[set_id]
+        del self._set_ids[self._set_keys.pop(set_id)]
+        self._base_refs[base_id] -= 1
+        if not self._base_refs[base_id]:
+            del self._base_refs[base_id]
+            del self._bases[base_id]
+
+    def _take_id(self):
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _ids(self, set_id):
+        """
+        Returns the sorted pair ids of a set.
+        """
+        base_id, added, removed = self._sets[set_id]
+        removed = set(removed)
+        return array.array('I', sorted(
+            [pair_id for pair_id in self._bases[base_id]
+             if pair_id not in removed] + list(added)))
+
+    def _contains(self, set_id, pair_id):
+        base_id, added, removed = self._sets[set_id]
+        if _contains(added, pair_id):
+            return True
+        return (not _contains(removed, pair_id) and
+                _contains(self._bases[base_id], pair_id))
+
+    def _pair_id(self, name, package_version):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        version_id = self._version_ids.get(package_version)
+        if version_id is None:
+            version_id = len(self._versions)
+            self._version_ids[package_version] = version_id
+            self._versions.append(package_version)
+        pair = (name_id, version_id)
+        pair_id = self._pair_ids.get(pair)
+        if pair_id is None:
+            pair_id = self._pair_ids[pair] = len(self._pairs)
+            self._pairs.append(pair)
+            self._name_pairs.setdefault(name_id, []).append(pair_id)
+        return pair_id
+
+    def _pair(self, pair_id):
+        name_id, version_id = self._pairs[pair_id]
+        return self._names[name_id], self._versions[version_id]
+
+    def _pair_ids_for(self, name_id):
+        return self._name_pairs.get(name_id, [])
+
+
+def _bytes(ids):
+    return ids.tobytes() if hasattr(ids, 'tobytes') else ids.tostring()
+
+
+def _contains(ids, pair_id):
+    i = bisect.bisect_left(ids, pair_id)
+    return i < len(ids) and ids[i] == pair_id
+
+
+def _diff_packages(old, new):
+    changes = {}
+    for name in set(old) | set(new):
+        old_version = old.get(name)
+        new_version = new.get(name)
+        if old_version != new_version:
+            changes[name] = (old_version, new_version)
+    return changes
@@ -0,0 +1,234 @@
+"""
+A common interface to the Apt, DNF/Yum and apk backends.
+
+The package manager of each host is detected once and cached by host string.
+`installed_packages()` detects the package manager and lists the installed
+packages in the same remote call, so checking the state of a host costs one
+round trip whatever its distribution.
+
+The cache lives in the process that detected the host. Detections made in
+`fleet` workers are lost with the workers, so run `detect_hosts()` first:
+it records every host in the calling process, and the workers of later
+`fleet.run` calls are forked with that knowledge.
+"""
+from fabric_package_management import apk, apt, cache, dnf, fleet
+from fabric_package_management._fabric import env, hide, run, settings, sudo
+
+
+BACKENDS = {
+    'apt': apt,
+    'dnf': dnf,
+    'yum': dnf,
+    'apk': apk,
+}
+
+# Host strings mapped to the name of their package manager.
+_detected = {}
+
+
+def _state_cmd():
+    """
+    A shell command that prints the package manager's name on the first line
+    followed by the list of installed packages.
+    """
+    cmds = [
+        ('apt', 'apt-get', apt.INSTALLED_PACKAGES_CMD),
+        ('dnf', 'dnf', dnf.INSTALLED_PACKAGES_CMD),
+        ('yum', 'yum', dnf.INSTALLED_PACKAGES_CMD),
+        ('apk', 'apk', apk.INSTALLED_PACKAGES_CMD),
+    ]
+    branches = [
+        'if command -v {0} >/dev/null 2>&1; then echo {1}; {2};'.format(
+            binary, name, cmd) for name, binary, cmd in cmds]
+    return ' el'.join(branches) + ' fi'
+
+
+def _run_cmd(func, cmd):
+    with settings(hide('everything'), warn_only=True):
+        return func(cmd)
+
+
+def _backend_kwargs(name, kwargs):
+    if name == 'yum':
+        kwargs = dict(kwargs, use_yum=True)
+    return kwargs
+
+
+def detect(use_sudo=False):
+    """
+    Detect the package manager of the remote host.
+
+    Returns one of `apt`, `dnf`, `yum` or `apk`. The result is cached per
+    host string.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    name = _detected.get(env.host_string)
+    if name is None:
+        func = use_sudo and sudo or run
+        output = _run_cmd(func, 'for b in apt-get dnf yum apk; do '
+                                'command -v $b >/dev/null 2>&1 && '
+                                'echo $b && break; done')
+        name = output.strip().replace('apt-get', 'apt')
+        if name not in BACKENDS:
+            raise ValueError('No supported package manager found on '
+                             '{0}'.format(env.host_string))
+        _detected[env.host_string] = name
+    return name
+
+
+def detect_hosts(hosts, use_sudo=False, pool_size=10, env=None):
+    """
+    Detect the package manager of many hosts in parallel and remember them in
+    this process.
+
+    Returns a list of the `fleet.HostResult` of the hosts that failed.
+
+    Args:
+      hosts (list): The host strings to detect.
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+      pool_size (int): The number of hosts to detect at once.
+        (Default: `10`)
+      env (dict): Extra Fabric settings for `fleet.run`.
+    """
+    failed = []
+    for result in fleet.run(hosts, detect, kwargs={'use_sudo': use_sudo},
+                            pool_size=pool_size, env=env):
+        if result.succeeded:
+            _detected[result.host] = result.value
+        else:
+            failed.append(result)
+    return failed
+
+
+def _detect_for(kwargs):
+    return detect(use_sudo=kwargs.get('use_sudo', False))
+
+
+def backend(use_sudo=False):
+    """
+    Returns the module implementing the remote host's package manager, e.g.
+    `fabric_package_management.apt`.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    return BACKENDS[detect(use_sudo=use_sudo)]
+
+
+def install(packages, **kwargs):
+    """
+    Install packages with the remote host's package manager.
+
+    All the packages are installed in a single command.
+
+    Args:
+      packages (list or str): The packages to install.
+      **kwargs: Options understood by the backend's `install`, such as
+        `use_sudo` or `verbose`.
+    """
+    name = _detect_for(kwargs)
+    return BACKENDS[name].install(packages, **_backend_kwargs(name, kwargs))
+
+
+def remove(packages, **kwargs):
+    """
+    Remove packages with the remote host's package manager.
+
+    Args:
+      packages (list or str): The packages to remove.
+      **kwargs: Options understood by the backend's `remove`.
+    """
+    name = _detect_for(kwargs)
+    return BACKENDS[name].remove(packages, **_backend_kwargs(name, kwargs))
+
+
+def update(**kwargs):
+    """
+    Refresh the package index of the remote host's package manager.
+
+    Args:
+      **kwargs: Options understood by the backend's `update`.
+    """
+    name = _detect_for(kwargs)
+    return BACKENDS[name].update(**_backend_kwargs(name, kwargs))
+
+
+def upgrade(**kwargs):
+    """
+    Upgrade all packages with the remote host's package manager.
+
+    Args:
+      **kwargs: Options understood by the backend's `upgrade`.
+    """
+    name = _detect_for(kwargs)
+    return BACKENDS[name].upgrade(**_backend_kwargs(name, kwargs))
+
+
+def installed(package, use_sudo=False):
+    """
+    Check if a package is installed on the remote host.
+
+    Returns `True` if installed, `False` if it is not.
+
+    Args:
+      package (str): The package to check if installed.
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    return backend(use_sudo=use_sudo).installed(package, use_sudo=use_sudo)
+
+
+def installed_packages(use_sudo=False):
+    """
+    List every installed package and its version in a single call.
+
+    If the host's package manager is not known yet, it is detected in the
+    same call and cached.
+
+    Returns a dict mapping package names to versions. Raises `RuntimeError`
+    if the packages could not be listed.
+
+    Args:
+      use_sudo (bool): If `True`, will use `sudo` instead of `run`.
+        (Default: `False`)
+    """
+    name = _detected.get(env.host_string)
+    if name is not None:
+        return BACKENDS[name].installed_packages(use_sudo=use_sudo)
+
+    func = use_sudo and sudo or run
+    cmd = _state_cmd()
+
+    def query():
+        output = _run_cmd(func, cmd)
+        if output.failed:
+            raise RuntimeError('Listing installed packages failed with '
+                               'status {0}'.format(output.return_code))
+        name, _, output = output.partition('\n')
+        name = name.strip()
+        if name not in BACKENDS:
+            raise ValueError('No supported package manager found on '
+                             '{0}'.format(env.host_string))
+        return [name, BACKENDS[name].parse_installed_packages(output)]
+    name, packages = cache.cached(cmd, query)
+    _detected[env.host_string] = name
+    return packages
+
+
+def available_versions(package, use_sudo=False):
+    """
+    List the versions of a package available to the remote host.
+
+    Args:
+      package (str): The package name.
+      use_sudo (bool): If `True`, the package manager is detected with `sudo`
+        instead of `run`. (Default: `False`)
+    """
+    name = detect(use_sudo=use_sudo)
+    return BACKENDS[name].available_versions(
+        package, **_backend_kwargs(name, {}))
@@ -0,0 +1,191 @@
+"""
+Canary and wave based rollouts of Apt operations.
+
+Hosts are split into a canary wave followed by waves that grow in size. Each
+wave runs concurrently, and after each one the rollout halts if too many
+hosts have failed so far, keeping the blast radius of a bad upgrade small.
+"""
+import collections
+
+from fabric_package_management import apt, checkpoint, fleet
+
+
+HostStatus = collections.namedtuple(
+    'HostStatus',
+    ['host', 'wave', 'succeeded', 'healthy', 'reboot_required', 'error',
+     'elapsed'])
+
+
+def plan_waves(hosts, canary=1, growth=2, max_wave=None):
+    """
+    Split hosts into a canary wave and growing waves.
+
+    Returns a list of lists of hosts. For example ten hosts with the
+    defaults are split into waves of 1, 2, 4 and 3 hosts.
+
+    Args:
+      hosts (list): The hosts to split, in rollout order.
+      canary (int): The number of hosts in the first wave. (Default: `1`)
+      growth (int): The factor each following wave grows by. (Default: `2`)
+      max_wave (int): The largest allowed wave size. (Default: no limit)
+    """
+    hosts = list(hosts)
+    waves = []
+    size = max(canary, 1)
+    while hosts:
+        if max_wave:
+            size = min(size, max_wave)
+        waves.append(hosts[:size])
+        hosts = hosts[size:]
+        size = max(int(size * growth), 1)
+    return waves
+
+
+def _apply(func, args, kwargs, health_check):
+    """
+    Run the operation on the current host followed by the checks.
+    """
+    result = func(*args, **kwargs)
+    status = {
+        'succeeded': getattr(result, 'succeeded', True),
+        'return_code': getattr(result, 'return_code', None),
+        'healthy': None,
+        'reboot_required': None,
+    }
+    if status['succeeded']:
+        status['reboot_required'] = apt.reboot_required()
+        status['healthy'] = bool(health_check()) if health_check else True
+    return status
+
+
+class Rollout(object):
+    """
+    A rollout of an Apt operation across hosts in waves.
+
+    Args:
+      hosts (list): The hosts to roll out to, in order. The first hosts
+        form the canary wave.
+      func (callable): A module level function to run on each host.
+        (Default: `apt.dist_upgrade`)
+      args (tuple): Positional arguments for `func`.
+      kwargs (dict): Keyword arguments for `func`.
+      canary (int): The number of hosts in the first wave. (Default: `1`)
+      growth (int): The factor each following wave grows by. (Default: `2`)
+      max_wave (int): The largest allowed wave size. (Default: no limit)
+      max_failure_rate (float): The fraction of attempted hosts that may
+        fail before the rollout halts. (Default: `0.0`)
+      health_check (callable): An optional module level function run on
+        each host after a successful operation. A falsy return value marks
+        the host as failed.
+      pool_size (int): The number of hosts of a wave to run at once.
+        (Default: `10`)
+      env (dict): Extra Fabric settings for `fleet.run`.
+      journal (checkpoint.Journal): If set, hosts that already succeeded in
+        the journal are skipped and every host's status is recorded, so
+        an interrupted rollout can be resumed.
+      operation (str): The name to journal the operation under.
+        (Default: derived from `func` and its arguments, e.g.
+        `apt.dist_upgrade`)
+    """
+
+    def __init__(self, hosts, func=apt.dist_upgrade, args=(), kwargs=None,
+                 canary=1, growth=2, max_wave=None, max_failure_rate=0.0,
+                 health_check=None, pool_size=10, env=None, journal=None,
+                 operation=None):
+        self.journal = journal
+        self.operation = operation or checkpoint.operation_name(
+            func, args, kwargs)
+        if journal is not None:
+            hosts = journal.pending(hosts, self.operation)
+        self.waves = plan_waves(hosts, canary, growth, max_wave)
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.max_failure_rate = max_failure_rate
+        self.health_check = health_check
+        self.pool_size = pool_size
+        self.env = env
+        self.results = []
+        self.halted = False
+
+    @property
+    def failed(self):
+        """
+        Returns the statuses of the hosts that failed.
+        """
+        return [status for status in self.results if not status.succeeded]
+
+    @property
+    def failure_rate(self):
+        """
+        Returns the fraction of attempted hosts that failed.
+        """
+        if not self.results:
+            return 0.0
+        return float(len(self.failed)) / len(self.results)
+
+    @property
+    def reboot_required(self):
+        """
+        Returns the hosts that need a reboot after the operation.
+        """
+        return [status.host for status in self.results
+                if status.reboot_required]
+
+    @property
+    def pending(self):
+        """
+        Returns the hosts that have not been attempted.
+        """
+        attempted = set(status.host for status in self.results)
+        return [host for wave in self.waves for host in wave
+                if host not in attempted]
+
+    def run(self):
+        """
+        Run the rollout wave by wave.
+
+        Yields a `HostStatus` for every host as it finishes. Stops after the
+        wave in which the failure rate went over `max_failure_rate`, setting
+        `halted`.
+        """
+        for number, wave in enumerate(self.waves):
+            if self.halted:
+                return
+            task_args = (self.func, self.args, self.kwargs, self.health_check)
+            for result in fleet.run(wave, _apply, args=task_args,
+                                    pool_size=self.pool_size, env=self.env):
+                status = self._status(number, result)
+                self.results.append(status)
+                if self.journal is not None:
+                    self.journal.record(self.operation, status)
+                yield status
+            if self.failure_rate > self.max_failure_rate:
+                self.halted = True
+
+    def _status(self, wave, result):
+        if not result.succeeded:
+            return HostStatus(result.host, wave, False, None, None,
+                              result.error, result.elapsed)
+        value = result.value
+        error = None
+        if not value['succeeded']:
+            error = 'Exited with status {0}'.format(value['return_code'])
+        elif not value['healthy']:
+            error = 'Health check failed'
+        return HostStatus(result.host, wave, error is None, value['healthy'],
+                          value['reboot_required'], error, result.elapsed)
+
+
+def rollout(hosts, **kwargs):
+    """
+    Run a `Rollout` to completion, or until it halts, and return it.
+
+    Args:
+      hosts (list): The hosts to roll out to, in order.
+      **kwargs: Any of the `Rollout` arguments.
+    """
+    plan = Rollout(hosts, **kwargs)
+    for _ in plan.run():
+        pass
+    return plan
@@ -0,0 +1,192 @@
+"""
+Throttling of concurrent downloads from package mirrors.
+
+A `Throttle` is passed to `fleet.run` to limit how many hosts download from
+the same mirror at once and to cap each host's download rate with Apt's
+`Acquire::http::Dl-Limit`. The limits adapt to the throughput that Apt
+reports: the number of hosts per mirror grows while the mirror keeps up and
+is halved when the aggregate throughput drops, so that a saturated mirror is
+not made to thrash.
+"""
+import re
+
+_FETCHED = re.compile(r'Fetched .* \(([\d.,]+) ?([kMG]?)B/s\)')
+
+_UNITS = {'': 1.0 / 1024, 'k': 1.0, 'M': 1024.0, 'G': 1024.0 ** 2}
+
+
+def fetch_rate(output):
+    """
+    Parse the download rate from the output of `apt-get`.
+
+    Returns the rate in kB/s, or `None` if nothing was downloaded.
+
+    Args:
+      output (str): The output of an `apt-get` command, which ends with a
+        line like `Fetched 8,430 kB in 3s (2,513 kB/s)`.
+    """
+    match = None
+    for match in _FETCHED.finditer(output):
+        pass
+    if match is None:
+        return None
+    rate = float(match.group(1).replace(',', '')) * _UNITS[match.group(2)]
+    return rate or None
+
+
+class _Mirror(object):
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.capacity = None
+        # Running hosts mapped to the most hosts seen downloading with them.
+        self.peaks = {}
+
+
+class Throttle(object):
+    """
+    Limits concurrent downloading hosts per mirror.
+
+    The function run by `fleet.run` must accept a `config` keyword argument,
+    as `apt.update`, `apt.install`, `apt.upgrade` and `apt.dist_upgrade` do.
+
+    Args:
+      mirrors (dict or callable): Maps each host to the name of the mirror
+        it downloads from. (Default: all hosts share one mirror)
+      max_hosts (int): The most hosts downloading from a mirror at once.
+        (Default: `4`)
+      min_hosts (int): The fewest hosts allowed to download from a mirror at
+        once when the limit is lowered. (Default: `1`)
+      bandwidth (int): The total kB/s to allow per mirror, shared between
+        its running hosts. (Default: derived from observed throughput)
+      adaptive (bool): If `False`, the limits are never adjusted.
+        (Default: `True`)
+      queue_mode (str): If set, Apt's `Acquire::Queue-Mode`, `host` or
+        `access`.
+    """
+
+    #: Headroom given to each host's Dl-Limit above its share of the
+    #: observed capacity, so that a faster mirror can still be detected.
+    headroom = 1.25
+
+    def __init__(self, mirrors=None, max_hosts=4, min_hosts=1,
+                 bandwidth=None, adaptive=True, queue_mode=None):
+        self.mirrors = mirrors or {}
+        self.max_hosts = max(max_hosts, 1)
+        self.min_hosts = max(min(min_hosts, self.max_hosts), 1)
+        self.bandwidth = bandwidth
+        self.adaptive = adaptive
+        self.queue_mode = queue_mode
+        self._states = {}
+        self._host_mirrors = {}
+
+    def mirror(self, host):
+        """
+        Returns the name of the mirror a host downloads from.
+
+        Args:
+          host (str): The host string.
+        """
+        if callable(self.mirrors):
+            return self.mirrors(host)
+        return self.mirrors.get(host)
+
+    def stats(self):
+        """
+        Returns a dict of the current `limit`, `running` hosts and observed
+        `capacity` in kB/s of each mirror.
+        """
+        return dict((name, {'limit': state.limit,
+                            'running': len(state.peaks),
+                            'capacity': state.capacity})
+                    for name, state in self._states.items())
+
+    def config(self, mirror):
+        """
+        Returns the Apt configuration options for a host starting a download
+        from a mirror.
+
+        Args:
+          mirror (str): The mirror name.
+        """
+        state = self._state(mirror)
+        config = {}
+        if self.queue_mode:
+            config['Acquire::Queue-Mode'] = self.queue_mode
+        if self.bandwidth:
+            rate = float(self.bandwidth) / state.limit
+        elif state.capacity:
+            rate = state.capacity * self.headroom / state.limit
+        else:
+            rate = None
+        if rate:
+            config['Acquire::http::Dl-Limit'] = max(int(rate), 1)
+        return config
+
+    def acquire(self, host):
+        """
+        Reserve a download slot on the host's mirror.
+
+        Returns the keyword arguments to add to the host's call, or `None`
+        if its mirror is busy.
+
+        Args:
+          host (str): The host string.
+        """
+        mirror = self.mirror(host)
+        state = self._state(mirror)
+        if len(state.peaks) >= state.limit:
+            return None
+        state.peaks[host] = 0
+        running = len(state.peaks)
+        for other in state.peaks:
+            state.peaks[other] = max(state.peaks[other], running)
+        self._host_mirrors[host] = mirror
+        return {'config': self.config(mirror)}
+
+    def release(self, result):
+        """
+        Free a host's download slot and learn from its throughput.
+
+        Args:
+          result (fleet.HostResult): The result of the host's call.
+        """
+        mirror = self._host_mirrors.pop(result.host)
+        concurrency = self._state(mirror).peaks.pop(result.host)
+        if not self.adaptive or not result.succeeded:
+            return
+        if not isinstance(result.value, str):
+            return
+        rate = fetch_rate(result.value)
+        if rate is not None:
+            self.observe(mirror, rate, concurrency)
+
+    def observe(self, mirror, rate, concurrency):
+        """
+        Adjust a mirror's limit from a host's download rate.
+
+        The mirror's aggregate throughput is estimated as the host's rate
+        times the number of hosts that were downloading with it. The limit
+        grows by one while that keeps up with the best recent aggregate, and
+        is halved when it drops below three quarters of it.
+
+        Args:
+          mirror (str): The mirror name.
+          rate (float): The host's download rate in kB/s.
+          concurrency (int): The most hosts that were downloading from the
+            mirror while the host was, including itself.
+        """
+        state = self._state(mirror)
+        aggregate = rate * concurrency
+        if state.capacity and aggregate < state.capacity * 0.75:
+            state.limit = max(state.limit // 2, self.min_hosts)
+        elif not state.capacity or aggregate >= state.capacity * 0.9:
+            state.limit = min(state.limit + 1, self.max_hosts)
+        # Let old peaks decay so a mirror that has recovered is noticed.
+        state.capacity = max(aggregate, (state.capacity or 0) * 0.9)
+
+    def _state(self, mirror):
+        state = self._states.get(mirror)
+        if state is None:
+            state = self._states[mirror] = _Mirror(self.max_hosts)
+        return state
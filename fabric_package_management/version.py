@@ -0,0 +1,133 @@
+"""
+Debian package version comparison.
+
+This follows the same algorithm as dpkg so that versions can be compared on
+the control node without asking a remote host.
+"""
+import functools
+
+_DIGITS = '0123456789'
+
+_OPERATORS = {
+    '<<': lambda c: c < 0,
+    '<=': lambda c: c <= 0,
+    '=': lambda c: c == 0,
+    '>=': lambda c: c >= 0,
+    '>>': lambda c: c > 0,
+    # Deprecated dpkg spellings of '<=' and '>='.
+    '<': lambda c: c <= 0,
+    '>': lambda c: c >= 0,
+}
+
+
+def _order(c):
+    """
+    Sort weight of a single non-digit character, as defined by dpkg.
+    """
+    if not c or c in _DIGITS:
+        return 0
+    if c.isalpha():
+        return ord(c)
+    if c == '~':
+        return -1
+    return ord(c) + 256
+
+
+def _compare_part(a, b):
+    """
+    Compare an upstream version or Debian revision string.
+    """
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a or j < len_b:
+        while ((i < len_a and a[i] not in _DIGITS) or
+               (j < len_b and b[j] not in _DIGITS)):
+            ac = _order(a[i] if i < len_a else '')
+            bc = _order(b[j] if j < len_b else '')
+            if ac != bc:
+                return ac - bc
+            i += 1
+            j += 1
+
+        while i < len_a and a[i] == '0':
+            i += 1
+        while j < len_b and b[j] == '0':
+            j += 1
+
+        first_diff = 0
+        while i < len_a and j < len_b and a[i] in _DIGITS and b[j] in _DIGITS:
+            if not first_diff:
+                first_diff = ord(a[i]) - ord(b[j])
+            i += 1
+            j += 1
+
+        if i < len_a and a[i] in _DIGITS:
+            return 1
+        if j < len_b and b[j] in _DIGITS:
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+
+def parse(version):
+    """
+    Split a version string into its epoch, upstream version and revision.
+
+    Returns a tuple of `(epoch, upstream, revision)` where `epoch` is an int.
+
+    Args:
+      version (str): A Debian version string, e.g. `1:2.4.7-1ubuntu4`.
+    """
+    version = version.strip()
+    epoch = 0
+    if ':' in version:
+        head, version = version.split(':', 1)
+        epoch = int(head or 0)
+    revision = ''
+    if '-' in version:
+        version, revision = version.rsplit('-', 1)
+    return epoch, version, revision
+
+
+def compare(a, b):
+    """
+    Compare two Debian version strings.
+
+    Returns a negative number if `a` is older than `b`, zero if they are
+    equal and a positive number if `a` is newer.
+
+    Args:
+      a (str): The first version.
+      b (str): The second version.
+    """
+    epoch_a, upstream_a, revision_a = parse(a)
+    epoch_b, upstream_b, revision_b = parse(b)
+    if epoch_a != epoch_b:
+        return epoch_a - epoch_b
+    result = _compare_part(upstream_a, upstream_b)
+    if result:
+        return result
+    return _compare_part(revision_a, revision_b)
+
+
+def check(a, operator, b):
+    """
+    Check a version relation as written in a Debian control file.
+
+    Returns `True` if `a <operator> b` holds.
+
+    Args:
+      a (str): The version being tested.
+      operator (str): One of `<<`, `<=`, `=`, `>=` or `>>`.
+      b (str): The version to test against.
+    """
+    try:
+        test = _OPERATORS[operator]
+    except KeyError:
+        raise ValueError('Unknown version operator: {0}'.format(operator))
+    return test(compare(a, b))
+
+
+#: Sort key for version strings, e.g. `sorted(versions, key=version.key)`.
+key = functools.cmp_to_key(compare)
@@ -16,5 +16,10 @@ setup(
     author_email='a.starr.b@gmail.com',
 
     packages=find_packages(),
-    install_requires=['fabric']
+    install_requires=['fabric'],
+    entry_points={
+        'console_scripts': [
+            'fab-pkg = fabric_package_management.cli:main',
+        ],
+    },
 )
@@ -0,0 +1,140 @@
+"""
+Stand-ins for Fabric and `fleet.run` shared by the tests that run without a
+remote host.
+"""
+import contextlib
+
+from fabric_package_management import fleet
+
+
+class Output(str):
+    """
+    A command's output with the attributes of Fabric's `_AttributeString`.
+    """
+
+
+def output(stdout='', return_code=0):
+    result = Output(stdout)
+    result.return_code = return_code
+    result.succeeded = return_code == 0
+    result.failed = not result.succeeded
+    return result
+
+
+@contextlib.contextmanager
+def _context(*args, **kwargs):
+    yield
+
+
+class _Env(object):
+
+    def __init__(self, host_string):
+        self.host_string = host_string
+
+
+class Remote(object):
+    """
+    Replaces `run`, `sudo`, `env` and the Fabric context managers used by a
+    module while active, recording every command and answering from
+    `outputs`.
+
+    Args:
+      module (module): The module whose Fabric names are replaced.
+      outputs (dict): Commands mapped to the `output()` they return, or to
+        a callable returning it. (Default: empty output for every command)
+      host (str): The current host string. (Default: `host1`)
+    """
+
+    NAMES = ('run', 'sudo', 'settings', 'hide', 'shell_env', 'env')
+
+    def __init__(self, module, outputs=None, host='host1'):
+        self.module = module
+        self.outputs = outputs or {}
+        self.host = host
+        self.commands = []
+        self._saved = {}
+
+    def __call__(self, cmd, *args, **kwargs):
+        self.commands.append(cmd)
+        value = self.outputs.get(cmd, output())
+        return value() if callable(value) else value
+
+    def __enter__(self):
+        for name in self.NAMES:
+            if hasattr(self.module, name):
+                self._saved[name] = getattr(self.module, name)
+        replacements = {'run': self, 'sudo': self, 'settings': _context,
+                        'hide': _context, 'shell_env': _context,
+                        'env': _Env(self.host)}
+        for name in self._saved:
+            setattr(self.module, name, replacements[name])
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, value in self._saved.items():
+            setattr(self.module, name, value)
+        self._saved = {}
+
+
+def result(host, succeeded=True, value='', elapsed=1.0):
+    """
+    A `fleet.HostResult`, exited with status 100 unless `succeeded`.
+    """
+    return fleet.HostResult(host, succeeded, value, 0 if succeeded else 100,
+                            None if succeeded else 'Exited with status 100',
+                            elapsed)
+
+
+def by_name(host):
+    """
+    The result of a host, failed if its name starts with `bad`.
+    """
+    return result(host, not host.startswith('bad'), 'Done', 0.5)
+
+
+def status(host):
+    """
+    The result of `rollout._apply` on a host. The operation fails on hosts
+    named `bad*` and hosts ending in `1` need a reboot.
+    """
+    bad = host.startswith('bad')
+    value = {'succeeded': not bad, 'return_code': 100 if bad else 0,
+             'healthy': True, 'reboot_required': host.endswith('1')}
+    return fleet.HostResult(host, True, value, None, None, 0.1)
+
+
+class Fleet(object):
+    """
+    Replaces `fleet.run` while active, recording the arguments of each call.
+
+    Args:
+      result (callable): Returns the `fleet.HostResult` of a host.
+        (Default: `by_name`)
+      local (bool): If `True`, call the function in this process instead and
+        return what it returns as a successful result. (Default: `False`)
+    """
+
+    def __init__(self, result=by_name, local=False):
+        self.result = result
+        self.local = local
+        self.calls = []
+        self._run = None
+
+    def run(self, hosts, func, args=(), kwargs=None, pool_size=None,
+            env=None, throttle=None):
+        self.calls.append((list(hosts), func, args, kwargs, pool_size, env,
+                           throttle))
+        for host in hosts:
+            if self.local:
+                value = func(*args, **(kwargs or {}))
+                yield fleet.HostResult(host, True, value, None, None, 0.1)
+            else:
+                yield self.result(host)
+
+    def __enter__(self):
+        self._run = fleet.run
+        fleet.run = self.run
+        return self
+
+    def __exit__(self, *exc_info):
+        fleet.run = self._run
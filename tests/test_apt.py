@@ -61,6 +61,13 @@ class AptTest(unittest.TestCase):
             self.assertTrue(update.succeeded)
             self.assertEqual(update.command, test_update_command)
 
+            update = apt.update(config={'Acquire::http::Dl-Limit': 500,
+                                        'Acquire::Queue-Mode': 'access'})
+            self.assertTrue(update.succeeded)
+            self.assertEqual(update.command,
+                             'apt-get update -o Acquire::Queue-Mode=access '
+                             '-o Acquire::http::Dl-Limit=500')
+
     def test_upgrade(self):
         with settings(host_string=self.container_host,
                       user='root',
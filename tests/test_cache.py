@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from fabric_package_management import apt, cache
+from tests import fakes
+
+
+class MemoryCacheTest(unittest.TestCase):
+
+    def make_cache(self, **kwargs):
+        return cache.MemoryCache(**kwargs)
+
+    def test_get_set(self):
+        c = self.make_cache()
+        self.assertEqual(c.lookup('web1', 'dpkg -s git'), (False, None))
+        c.set('web1', 'dpkg -s git', True)
+        self.assertEqual(c.lookup('web1', 'dpkg -s git'), (True, True))
+        self.assertEqual(c.lookup('web2', 'dpkg -s git'), (False, None))
+        self.assertEqual(c.stats(), {'hits': 1, 'misses': 2, 'entries': 1})
+
+    def test_ttl(self):
+        c = self.make_cache(ttl=0.01)
+        c.set('web1', 'dpkg -s git', True)
+        time.sleep(0.02)
+        self.assertEqual(c.get('web1', 'dpkg -s git'), (False, None))
+
+    def test_lru(self):
+        c = self.make_cache(max_entries=2)
+        c.set('web1', 'a', 1)
+        time.sleep(0.001)
+        c.set('web1', 'b', 2)
+        time.sleep(0.001)
+        c.get('web1', 'a')
+        time.sleep(0.001)
+        c.set('web1', 'c', 3)
+        self.assertEqual(c.get('web1', 'a'), (True, 1))
+        self.assertEqual(c.get('web1', 'b'), (False, None))
+        self.assertEqual(len(c), 2)
+
+    def test_invalidate(self):
+        c = self.make_cache()
+        c.set('web1', 'a', {'git': '1:1.9.1-1'})
+        c.set('web2', 'a', {'git': '1:1.9.1-1'})
+        c.invalidate('web1')
+        self.assertEqual(c.get('web1', 'a'), (False, None))
+        self.assertEqual(c.get('web2', 'a'), (True, {'git': '1:1.9.1-1'}))
+        c.invalidate()
+        self.assertEqual(len(c), 0)
+
+    def test_copies(self):
+        c = self.make_cache()
+        packages = {'git': '1:1.9.1-1'}
+        c.set('web1', 'dpkg-query', packages)
+        packages['git'] = '1:2.0-1'
+        found, value = c.get('web1', 'dpkg-query')
+        value['vim'] = '2:7.4-1'
+        self.assertEqual(c.get('web1', 'dpkg-query'),
+                         (True, {'git': '1:1.9.1-1'}))
+
+
+class DiskCacheTest(MemoryCacheTest):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make_cache(self, **kwargs):
+        return cache.DiskCache(self.path, **kwargs)
+
+    def test_shared(self):
+        writer = self.make_cache()
+        reader = self.make_cache()
+        writer.set('web1', 'apt-cache madison git', ['1:1.9.1-1'])
+        self.assertEqual(reader.get('web1', 'apt-cache madison git'),
+                         (True, ['1:1.9.1-1']))
+
+
+class CachedTest(unittest.TestCase):
+
+    def tearDown(self):
+        cache.disable()
+
+    def test_cached(self):
+        calls = []
+
+        def query():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cache.cached('cmd', query), 1)
+        c = cache.enable()
+        with fakes.Remote(cache, host='web1'):
+            self.assertEqual(cache.cached('cmd', query), 2)
+            self.assertEqual(cache.cached('cmd', query), 2)
+            cache.invalidate()
+            self.assertEqual(cache.cached('cmd', query), 3)
+        self.assertEqual(c.stats()['hits'], 1)
+
+    def test_invalidate_forked(self):
+        c = cache.enable()
+        c.set('web1', 'cmd', 1)
+        cache.invalidate_forked('web1')
+        self.assertEqual(len(c), 0)
+
+        c = cache.enable(cache.DiskCache(':memory:'))
+        c.set('web1', 'cmd', 1)
+        cache.invalidate_forked('web1')
+        self.assertEqual(len(c), 1)
+
+    def test_apt(self):
+        c = cache.enable()
+
+        def install():
+            # A query cached while the install runs must not outlive it.
+            c.set('host1', 'dpkg -s git', False)
+            return fakes.output()
+
+        outputs = {'dpkg -s git': fakes.output('Status: install ok installed'),
+                   'apt-get install --yes git': install}
+        with fakes.Remote(cache), fakes.Remote(apt, outputs) as remote:
+            self.assertTrue(apt.installed('git'))
+            self.assertTrue(apt.installed('git'))
+            self.assertEqual(remote.commands, ['dpkg -s git'])
+            apt.install('git')
+            self.assertTrue(apt.installed('git'))
+        self.assertEqual(remote.commands,
+                         ['dpkg -s git', 'apt-get install --yes git',
+                          'dpkg -s git'])
+        self.assertEqual(c.stats()['hits'], 1)
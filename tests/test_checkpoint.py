@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fabric_package_management import apt, checkpoint, rollout
+from tests import fakes
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'journal.jsonl')
+        self.fleet = fakes.Fleet(fakes.status)
+        self.fleet.__enter__()
+
+    def tearDown(self):
+        self.fleet.__exit__()
+        shutil.rmtree(self.tmp)
+
+    def test_operation_name(self):
+        self.assertEqual(checkpoint.operation_name(apt.upgrade),
+                         'apt.upgrade')
+        self.assertEqual(
+            checkpoint.operation_name(apt.install, (['htop', 'git'],),
+                                      {'verbose': False, 'config': {'a': 1}}),
+            'apt.install htop git config={"a": 1} verbose=false')
+
+    def test_resume(self):
+        hosts = ['host1', 'host2', 'host3']
+        with checkpoint.Journal(self.path) as journal:
+            journal.record('apt.upgrade', fakes.result('host1'))
+            journal.record('apt.upgrade', fakes.result('host2', False))
+            journal.record('apt.update', fakes.result('host3'))
+
+        with open(self.path, 'a') as f:
+            f.write('{"host": "host3", "oper')
+
+        with checkpoint.Journal(self.path) as journal:
+            self.assertEqual(journal.succeeded('apt.upgrade'),
+                             set(['host1']))
+            self.assertEqual(journal.failed('apt.upgrade'), set(['host2']))
+            self.assertEqual(journal.pending(hosts, 'apt.upgrade'),
+                             ['host2', 'host3'])
+            journal.record('apt.upgrade', fakes.result('host2'))
+
+        with checkpoint.Journal(self.path) as journal:
+            self.assertEqual(journal.pending(hosts, 'apt.upgrade'),
+                             ['host3'])
+
+    def test_run(self):
+        with checkpoint.Journal(self.path) as journal:
+            journal.record('apt.update', fakes.result('host1'))
+            results = list(journal.run(['host1', 'host2'], apt.update))
+            self.assertEqual([r.host for r in results], ['host2'])
+            self.assertEqual(journal.pending(['host1', 'host2'],
+                                             'apt.update'), [])
+
+    def test_run_arguments(self):
+        with checkpoint.Journal(self.path) as journal:
+            list(journal.run(['host1'], apt.install, args=(['htop'],)))
+            results = list(journal.run(['host1'], apt.install,
+                                       args=(['git'],)))
+            self.assertEqual([r.host for r in results], ['host1'])
+            self.assertEqual(journal.succeeded('apt.install htop'),
+                             set(['host1']))
+            self.assertEqual(journal.succeeded('apt.install git'),
+                             set(['host1']))
+
+    def test_rollout(self):
+        hosts = ['host{0}'.format(i) for i in range(5)]
+        with checkpoint.Journal(self.path) as journal:
+            journal.record('apt.dist_upgrade', fakes.result('host0'))
+            journal.record('apt.dist_upgrade', fakes.result('host3'))
+            plan = rollout.rollout(hosts, journal=journal)
+            self.assertEqual([status.host for status in plan.results],
+                             ['host1', 'host2', 'host4'])
+            self.assertEqual(journal.pending(hosts, 'apt.dist_upgrade'), [])
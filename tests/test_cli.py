@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fabric_package_management import apt, checkpoint, cli
+from tests import fakes
+
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.hosts = os.path.join(self.tmp, 'hosts')
+        with open(self.hosts, 'w') as f:
+            f.write('# web\nweb1\nroot@web2:2222  # staging\n\nbad3\n')
+        self.fleet = fakes.Fleet()
+        self.fleet.__enter__()
+
+    def tearDown(self):
+        self.fleet.__exit__()
+        shutil.rmtree(self.tmp)
+
+    def _main(self, *argv):
+        stdout = io.StringIO()
+        code = cli.main(['--hosts', self.hosts] + list(argv), stdout=stdout)
+        lines = [json.loads(line) for line in
+                 stdout.getvalue().splitlines()]
+        return code, lines
+
+    def test_read_hosts(self):
+        with open(self.hosts) as f:
+            self.assertEqual(cli.read_hosts(f),
+                             ['web1', 'root@web2:2222', 'bad3'])
+
+    def test_install(self):
+        code, lines = self._main('install', 'htop', 'git', '-c', '50',
+                                 '-u', 'deploy', '--no-sudo')
+        self.assertEqual(code, 1)
+        (hosts, func, args, kwargs, pool_size, env,
+         throttle) = self.fleet.calls[0]
+        self.assertEqual(hosts, ['web1', 'root@web2:2222', 'bad3'])
+        self.assertEqual(func, apt.install)
+        self.assertEqual(args, (['htop', 'git'],))
+        self.assertEqual(kwargs, {'use_sudo': False, 'verbose': False})
+        self.assertEqual(pool_size, 50)
+        self.assertEqual(env, {'abort_on_prompts': True, 'user': 'deploy'})
+        self.assertEqual(throttle, None)
+        self.assertEqual(lines[0], {
+            'host': 'web1', 'operation': 'install', 'succeeded': True,
+            'return_code': 0, 'error': None, 'elapsed': 0.5})
+        self.assertFalse(lines[2]['succeeded'])
+
+    def test_output_and_throttle(self):
+        code, lines = self._main('update', '--output',
+                                 '--max-hosts-per-mirror', '2')
+        self.assertEqual(lines[0]['output'], 'Done')
+        self.assertEqual(self.fleet.calls[0][6].max_hosts, 2)
+
+    def test_installed_packages(self):
+        outputs = {apt.INSTALLED_PACKAGES_CMD: fakes.output(
+            'ii \tgit\t1:1.9.1-1\n')}
+        with fakes.Fleet(local=True) as fleet, fakes.Remote(apt, outputs):
+            code, lines = self._main('installed-packages')
+        self.assertEqual(code, 0)
+        self.assertEqual(fleet.calls[0][3], {'use_sudo': True})
+        self.assertEqual(lines[0]['result'], {'git': '1:1.9.1-1'})
+
+    def test_reboot_required(self):
+        calls = []
+
+        def exists(path, **kwargs):
+            calls.append((path, kwargs))
+            return True
+        saved = apt.exists
+        apt.exists = exists
+        try:
+            with fakes.Fleet(local=True) as fleet:
+                code, lines = self._main('reboot-required', '--no-sudo')
+        finally:
+            apt.exists = saved
+        self.assertEqual(code, 0)
+        self.assertEqual(fleet.calls[0][3],
+                         {'use_sudo': False, 'verbose': False})
+        self.assertEqual(calls[0], ('/var/run/reboot-required',
+                                    {'use_sudo': False, 'verbose': False}))
+        self.assertEqual([line['result'] for line in lines], [True] * 3)
+
+    def test_journal(self):
+        journal = os.path.join(self.tmp, 'journal')
+        self._main('upgrade', '--journal', journal)
+        code, lines = self._main('upgrade', '--journal', journal)
+        self.assertEqual([line['host'] for line in lines], ['bad3'])
+        self.assertEqual(code, 1)
+
+        self._main('install', 'htop', '--journal', journal)
+        code, lines = self._main('install', 'git', '--journal', journal)
+        self.assertEqual([line['host'] for line in lines],
+                         ['web1', 'root@web2:2222', 'bad3'])
+        code, lines = self._main('install', 'git', '--journal', journal)
+        self.assertEqual([line['host'] for line in lines], ['bad3'])
+
+        # The library writes the same keys for the same call.
+        with checkpoint.Journal(journal) as j:
+            self.assertEqual(j.succeeded(checkpoint.operation_name(
+                apt.install, (['git'],),
+                {'use_sudo': True, 'verbose': False})),
+                set(['web1', 'root@web2:2222']))
+        code, lines = self._main('install', 'git', '--no-sudo',
+                                 '--journal', journal)
+        self.assertEqual(len(lines), 3)
@@ -0,0 +1,66 @@
+import json
+import subprocess
+import sys
+import unittest
+
+try:
+    import fabric.api  # noqa: F401
+except ImportError:
+    fabric = None
+
+
+MODULES = ['apt', 'apk', 'dnf', 'packages', 'fleet', 'index', 'inventory',
+           'rollout', 'throttle', 'checkpoint', 'version', 'cli', 'cache']
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+for name in {modules!r}:
+    __import__('fabric_package_management.' + name)
+elapsed = time.time() - start
+loaded = sorted(m for m in sys.modules
+                if m.split('.')[0] in ('fabric', 'paramiko'))
+print(json.dumps([elapsed, loaded]))
+"""
+
+
+def _import_time(modules):
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT.format(modules=modules)])
+    return json.loads(output.decode('utf-8'))
+
+
+class ImportTest(unittest.TestCase):
+    """
+    Importing the package must not load Fabric or paramiko, which are only
+    needed once a remote command is run.
+    """
+
+    @unittest.skipUnless(fabric, 'Fabric is not installed')
+    def test_lazy_fabric(self):
+        elapsed, loaded = _import_time(MODULES)
+        self.assertEqual(loaded, [])
+
+    def test_lazy_sqlite(self):
+        script = ('import sys, fabric_package_management.packages; '
+                  'print("sqlite3" in sys.modules)')
+        output = subprocess.check_output([sys.executable, '-c', script])
+        self.assertEqual(output.strip(), b'False')
+
+    def test_import_time(self):
+        runs = 5
+        elapsed = min(_import_time(MODULES)[0] for _ in range(runs))
+        print('Importing fabric_package_management: {0:.1f}ms'.format(
+            elapsed * 1000))
+        if fabric is None:
+            return
+        fabric_elapsed = min(
+            _import_time_of('fabric.api') for _ in range(runs))
+        print('Importing fabric.api: {0:.1f}ms'.format(fabric_elapsed * 1000))
+        self.assertTrue(elapsed < fabric_elapsed)
+
+
+def _import_time_of(module):
+    script = ('import time; start = time.time(); import {0}; '
+              'print(time.time() - start)').format(module)
+    return float(subprocess.check_output([sys.executable, '-c', script]))
@@ -0,0 +1,167 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from fabric_package_management import index
+
+
+PACKAGES = b"""Package: apache2
+Architecture: amd64
+Version: 2.4.7-1ubuntu4
+Pre-Depends: dpkg (>= 1.17)
+Depends: apache2-bin (= 2.4.7-1ubuntu4), lsb-base, mime-support | mailcap
+Description: Apache HTTP Server
+ The Apache HTTP Server Project's goal is to build a secure, efficient and
+ extensible HTTP server as standards-based Open Source software.
+
+Package: apache2-bin
+Architecture: amd64
+Version: 2.4.7-1ubuntu4
+Depends: libc6 (>= 2.14),
+ libssl1.0.0 (>= 1.0.1)
+Provides: httpd
+
+Package: dpkg
+Architecture: amd64
+Version: 1.17.5ubuntu5
+
+Package: lsb-base
+Architecture: all
+Version: 4.1+Debian11ubuntu6
+
+Package: mailcap
+Architecture: all
+Version: 3.52ubuntu1
+
+Package: libc6
+Architecture: amd64
+Version: 2.19-0ubuntu6
+
+Package: web-app
+Architecture: all
+Version: 1.0
+Depends: httpd, python3:any (>= 3.4)
+"""
+
+UPDATES = b"""Package: apache2
+Architecture: i386
+Version: 2.4.7-1ubuntu4.22
+Depends: apache2-bin (= 2.4.7-1ubuntu4.22)
+
+Package: apache2
+Architecture: amd64
+Version: 2.4.7-1ubuntu4.22
+Depends: apache2-bin (= 2.4.7-1ubuntu4.22)
+
+Package: libc6
+Architecture: amd64
+Version: 2.19-0ubuntu6
+"""
+
+
+class PackageIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.main = os.path.join(self.tmp, 'main_Packages')
+        with open(self.main, 'wb') as f:
+            f.write(PACKAGES)
+        self.updates = os.path.join(self.tmp, 'updates_Packages.gz')
+        with gzip.open(self.updates, 'wb') as f:
+            f.write(UPDATES)
+        self.index = index.PackageIndex.from_files([self.main, self.updates])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_load(self):
+        self.assertEqual(len(self.index), 7)
+        self.assertEqual(self.index.versions('apache2'),
+                         ['2.4.7-1ubuntu4.22', '2.4.7-1ubuntu4'])
+        self.assertEqual(self.index.versions('libc6'), ['2.19-0ubuntu6'])
+        self.assertEqual(
+            [(package.version, package.architecture)
+             for package in self.index.packages('apache2')],
+            [('2.4.7-1ubuntu4.22', 'i386'), ('2.4.7-1ubuntu4.22', 'amd64'),
+             ('2.4.7-1ubuntu4', 'amd64')])
+        self.assertEqual(
+            len(self.index.packages('apache2', architecture='amd64')), 2)
+        bin_package = self.index.candidate('apache2-bin')
+        self.assertEqual(bin_package.depends,
+                         'libc6 (>= 2.14), libssl1.0.0 (>= 1.0.1)')
+        self.assertIn('httpd', self.index)
+        self.assertEqual(self.index.providers('httpd'), ('apache2-bin',))
+
+    def test_available(self):
+        self.assertTrue(self.index.available('apache2'))
+        self.assertTrue(self.index.available('apache2', '2.4.7-1ubuntu4'))
+        self.assertFalse(self.index.available('apache2', '1.0'))
+        self.assertFalse(self.index.available('nginx'))
+
+    def test_parse_relations(self):
+        self.assertEqual(
+            index.parse_relations('a (>= 1.0), b:any | c, d [amd64]'),
+            [(('a', '>=', '1.0'),),
+             (('b', None, None), ('c', None, None)),
+             (('d', None, None),)])
+        self.assertEqual(index.parse_relations(None), [])
+
+    def test_closure(self):
+        resolved, missing = self.index.closure('apache2')
+        self.assertEqual(resolved['apache2'].version, '2.4.7-1ubuntu4.22')
+        # The newest apache2 needs an apache2-bin that is not in the index.
+        self.assertEqual(missing, set(['apache2-bin (= 2.4.7-1ubuntu4.22)']))
+
+        resolved, missing = self.index.closure(['web-app'])
+        self.assertEqual(sorted(resolved),
+                         ['apache2-bin', 'libc6', 'web-app'])
+        self.assertEqual(missing, set(['libssl1.0.0 (>= 1.0.1)',
+                                       'python3 (>= 3.4)']))
+
+    def test_closure_architecture(self):
+        resolved, missing = self.index.closure('apache2',
+                                               architecture='i386')
+        self.assertEqual(resolved['apache2'].architecture, 'i386')
+        self.assertEqual(missing, set(['apache2-bin (= 2.4.7-1ubuntu4.22)']))
+
+        resolved, missing = self.index.closure('web-app',
+                                               architecture='i386')
+        # web-app is for `all` and matches, the amd64 provider of httpd does
+        # not.
+        self.assertEqual(sorted(resolved), ['web-app'])
+        self.assertEqual(missing, set(['httpd', 'python3 (>= 3.4)']))
+
+
+@unittest.skipUnless(os.environ.get('FPM_PACKAGES_INDEX'),
+                     'Set FPM_PACKAGES_INDEX to the path of a full Packages '
+                     'index, e.g. Ubuntu main, to run the benchmark')
+class PackageIndexBenchmark(unittest.TestCase):
+
+    def test_load(self):
+        path = os.environ['FPM_PACKAGES_INDEX']
+        if tracemalloc is not None:
+            tracemalloc.start()
+        start = time.time()
+        packages = index.PackageIndex.from_files([path])
+        elapsed = time.time() - start
+        if tracemalloc is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print('{0}: {1} packages in {2:.2f}s, {3:.1f} MiB held, '
+                  '{4:.1f} MiB peak'.format(path, len(packages), elapsed,
+                                            current / 2.0 ** 20,
+                                            peak / 2.0 ** 20))
+        start = time.time()
+        for name in packages.names():
+            packages.closure(name)
+        print('Resolved the closure of every package in {0:.2f}s'.format(
+            time.time() - start))
+        self.assertTrue(len(packages) > 0)
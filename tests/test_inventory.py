@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fabric_package_management import apt
+from fabric_package_management.inventory import Inventory
+from tests import fakes
+
+
+WEB = {'openssl': '1.0.1f-1ubuntu2.22', 'apache2': '2.4.7-1ubuntu4.22',
+       'libc6': '2.19-0ubuntu6.14'}
+DB = {'openssl': '1.0.1f-1ubuntu2.27', 'postgresql': '9.3+154ubuntu1',
+      'libc6': '2.19-0ubuntu6.14'}
+
+
+class InventoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = Inventory()
+        for i in range(100):
+            self.inventory.add('web{0}'.format(i), WEB)
+        self.inventory.add('db0', DB)
+
+    def test_parse_installed_packages(self):
+        output = ('ii \tlibc6\t2.19-0ubuntu6.14\r\n'
+                  'hi \topenssl\t1.0.1f-1ubuntu2.22\r\n'
+                  'rc \tapache2\t2.4.7-1ubuntu4.22\r\n'
+                  'un \trolldice\t')
+        self.assertEqual(apt.parse_installed_packages(output),
+                         {'libc6': '2.19-0ubuntu6.14',
+                          'openssl': '1.0.1f-1ubuntu2.22'})
+
+    def test_installed_packages_failed(self):
+        outputs = {apt.INSTALLED_PACKAGES_CMD: fakes.output('', 2)}
+        with fakes.Remote(apt, outputs):
+            self.assertRaises(RuntimeError, apt.installed_packages)
+
+    def test_shared_storage(self):
+        self.assertEqual(len(self.inventory), 101)
+        # Identical hosts share their package set.
+        self.assertEqual(len(self.inventory._sets), 2)
+        self.assertEqual(len(self.inventory._names), 4)
+        self.assertEqual(self.inventory.packages('web42'), WEB)
+
+    def test_delta_storage(self):
+        base = dict(('lib{0}'.format(i), '1.0-{0}'.format(i))
+                    for i in range(40))
+        inventory = Inventory()
+        for i in range(100):
+            inventory.add('host{0}'.format(i),
+                          dict(base, app='2.{0}'.format(i)))
+        # Hosts that differ in one package share a base and keep a delta.
+        self.assertEqual(len(inventory._bases), 1)
+        self.assertEqual(len(inventory._sets), 100)
+        self.assertTrue(all(len(added) + len(removed) <= 2
+                            for _, added, removed in
+                            inventory._sets.values()))
+        self.assertEqual(inventory.packages('host7'),
+                         dict(base, app='2.7'))
+        self.assertEqual(inventory.version('host7', 'lib3'), '1.0-3')
+        self.assertEqual(inventory.query('app', '>=', '2.98'),
+                         {'host98': '2.98', 'host99': '2.99'})
+        self.assertEqual(len(inventory.query('lib0')), 100)
+
+    def test_replace_and_remove(self):
+        for i in range(50):
+            self.inventory.add('db0', dict(DB, postgresql='9.3+{0}'.format(i)))
+        self.assertEqual(len(self.inventory._sets), 2)
+        self.assertEqual(self.inventory.version('db0', 'postgresql'), '9.3+49')
+        self.inventory.remove('db0')
+        self.assertEqual(len(self.inventory._sets), 1)
+        self.assertEqual(len(self.inventory._bases), 1)
+        self.assertEqual(self.inventory.query('postgresql'), {})
+        for i in range(100):
+            self.inventory.remove('web{0}'.format(i))
+        self.assertEqual(self.inventory._sets, {})
+        self.assertEqual(self.inventory._bases, {})
+
+    def test_query(self):
+        self.assertEqual(self.inventory.version('db0', 'openssl'),
+                         '1.0.1f-1ubuntu2.27')
+        self.assertEqual(self.inventory.version('db0', 'apache2'), None)
+        old = self.inventory.query('openssl', '<<', '1.0.1f-1ubuntu2.27')
+        self.assertEqual(len(old), 100)
+        self.assertEqual(old['web0'], '1.0.1f-1ubuntu2.22')
+        self.assertEqual(self.inventory.query('postgresql'),
+                         {'db0': '9.3+154ubuntu1'})
+        self.assertEqual(self.inventory.query('nginx'), {})
+        self.assertRaises(ValueError, self.inventory.query, 'openssl', '<<')
+        self.assertRaises(ValueError, self.inventory.query, 'openssl',
+                          version='1.0.1g')
+
+    def test_diff(self):
+        self.assertEqual(self.inventory.diff('web0', 'web1'), {})
+        self.assertEqual(self.inventory.diff('web0', 'db0'), {
+            'openssl': ('1.0.1f-1ubuntu2.22', '1.0.1f-1ubuntu2.27'),
+            'apache2': ('2.4.7-1ubuntu4.22', None),
+            'postgresql': (None, '9.3+154ubuntu1')})
+
+    def test_diff_snapshot(self):
+        snapshot = Inventory()
+        for i in range(100):
+            snapshot.add('web{0}'.format(i), WEB)
+        snapshot.add('web0', dict(WEB, openssl='1.0.1f-1ubuntu2.27'))
+        snapshot.add('db1', DB)
+        changes = self.inventory.diff_snapshot(snapshot)
+        self.assertEqual(sorted(changes), ['db0', 'db1', 'web0'])
+        self.assertEqual(changes['web0'], {
+            'openssl': ('1.0.1f-1ubuntu2.22', '1.0.1f-1ubuntu2.27')})
+        self.assertEqual(changes['db0']['postgresql'],
+                         ('9.3+154ubuntu1', None))
+
+    def test_save_load(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'inventory.json.gz')
+            self.inventory.add('web0', dict(WEB, apache2='2.4.7-1ubuntu4.23'))
+            self.inventory.save(path)
+            loaded = Inventory.load(path)
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(loaded.hosts(), self.inventory.hosts())
+        self.assertEqual(loaded.packages('db0'), DB)
+        self.assertEqual(loaded.version('web0', 'apache2'),
+                         '2.4.7-1ubuntu4.23')
+        self.assertEqual(len(loaded.query('openssl', '<<', '1.0.1g')), 101)
+        loaded.add('web100', WEB)
+        self.assertEqual(len(loaded._sets), 3)
+        loaded.remove('web0')
+        self.assertEqual(len(loaded._sets), 2)
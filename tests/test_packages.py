@@ -0,0 +1,117 @@
+import unittest
+
+from fabric_package_management import apk, apt, dnf, packages
+from tests import fakes
+
+
+class PackagesTest(unittest.TestCase):
+
+    def test_state_cmd(self):
+        cmd = packages._state_cmd()
+        self.assertTrue(cmd.startswith(
+            'if command -v apt-get >/dev/null 2>&1; then echo apt; '
+            'dpkg-query'))
+        self.assertIn('; elif command -v dnf >/dev/null 2>&1; then echo dnf; '
+                      'rpm -qa', cmd)
+        self.assertTrue(cmd.endswith('then echo apk; apk info -v; fi'))
+
+    def test_installed_packages_failed(self):
+        for module in (dnf, apk):
+            outputs = {module.INSTALLED_PACKAGES_CMD: fakes.output('', 1)}
+            with fakes.Remote(module, outputs):
+                self.assertRaises(RuntimeError, module.installed_packages)
+
+        outputs = {packages._state_cmd(): fakes.output('apt\n', 2)}
+        with fakes.Remote(packages, outputs):
+            self.assertRaises(RuntimeError, packages.installed_packages)
+        self.assertEqual(packages._detected, {})
+
+    def test_detect_hosts(self):
+        def result(host):
+            if host.startswith('bad'):
+                return fakes.result(host, False)
+            return fakes.result(host, value='dnf')
+        try:
+            with fakes.Fleet(result) as fleet:
+                failed = packages.detect_hosts(['web1', 'bad2'],
+                                               use_sudo=True)
+            self.assertEqual([r.host for r in failed], ['bad2'])
+            self.assertEqual(packages._detected, {'web1': 'dnf'})
+            self.assertEqual(fleet.calls[0][3], {'use_sudo': True})
+        finally:
+            packages._detected.clear()
+
+    def test_detect_use_sudo(self):
+        calls = []
+
+        def detect(use_sudo=False):
+            calls.append(use_sudo)
+            return 'apk'
+        saved = packages.detect
+        packages.detect = detect
+        try:
+            with fakes.Remote(apk):
+                packages.install('htop', use_sudo=True)
+                packages.update()
+                packages.available_versions('htop', use_sudo=True)
+        finally:
+            packages.detect = saved
+        self.assertEqual(calls, [True, False, True])
+
+    def test_installed_packages(self):
+        outputs = {packages._state_cmd(): fakes.output(
+            'apk\nmusl-1.2.2-r7\n')}
+        try:
+            with fakes.Remote(packages, outputs) as remote:
+                self.assertEqual(packages.installed_packages(),
+                                 {'musl': '1.2.2-r7'})
+                self.assertEqual(packages._detected, {'host1': 'apk'})
+            self.assertEqual(len(remote.commands), 1)
+        finally:
+            packages._detected.clear()
+
+    def test_apt_available_versions(self):
+        output = ('   apache2 | 2.4.7-1ubuntu4.22 | http://archive.ubuntu.com'
+                  '/ubuntu/ trusty-updates/main amd64 Packages\r\n'
+                  '   apache2 | 2.4.7-1ubuntu4 | http://archive.ubuntu.com'
+                  '/ubuntu/ trusty/main amd64 Packages\r\n'
+                  '   apache2 | 2.4.7-1ubuntu4 | http://archive.ubuntu.com'
+                  '/ubuntu/ trusty/main Sources\r\n')
+        self.assertEqual(apt.parse_available_versions(output),
+                         ['2.4.7-1ubuntu4.22', '2.4.7-1ubuntu4'])
+        self.assertEqual(apt.parse_available_versions(''), [])
+
+    def test_dnf_installed_packages(self):
+        output = ('bash\t(none)\t5.1.8-6.el9\n'
+                  'openssl\t1\t3.0.7-27.el9\n'
+                  'gpg-pubkey\t(none)\t8483c65d-5ccc5b19\n')
+        self.assertEqual(dnf.parse_installed_packages(output), {
+            'bash': '5.1.8-6.el9',
+            'openssl': '1:3.0.7-27.el9',
+            'gpg-pubkey': '8483c65d-5ccc5b19'})
+
+    def test_dnf_available_versions(self):
+        output = ('Available Packages\n'
+                  'nginx.x86_64    1:1.20.1-14.el9    appstream\n'
+                  'nginx.x86_64    1:1.20.1-16.el9    appstream\n'
+                  'nginx-core.x86_64    1:1.20.1-16.el9    appstream\n')
+        self.assertEqual(dnf.parse_available_versions(output, 'nginx'),
+                         ['1:1.20.1-14.el9', '1:1.20.1-16.el9'])
+
+    def test_apk_installed_packages(self):
+        output = ('musl-1.2.2-r7\n'
+                  'libcrypto1.1-1.1.1n-r0\n'
+                  'WARNING: Ignoring APKINDEX\n')
+        self.assertEqual(apk.parse_installed_packages(output), {
+            'musl': '1.2.2-r7',
+            'libcrypto1.1': '1.1.1n-r0'})
+
+    def test_apk_available_versions(self):
+        output = ('bash policy:\n'
+                  '  5.1.16-r0:\n'
+                  '    lib/apk/db/../../../etc/apk/cache\n'
+                  '    https://dl-cdn.alpinelinux.org/alpine/v3.15/main\n'
+                  '  5.1.8-r0:\n'
+                  '    https://dl-cdn.alpinelinux.org/alpine/v3.14/main\n')
+        self.assertEqual(apk.parse_available_versions(output),
+                         ['5.1.16-r0', '5.1.8-r0'])
@@ -0,0 +1,81 @@
+import unittest
+
+from fabric_package_management import apt, rollout
+from tests import fakes
+
+
+def _upgrade(fail=False):
+    return fakes.output('', 100 if fail else 0)
+
+
+def _unhealthy():
+    return False
+
+
+class RolloutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fleet = fakes.Fleet(fakes.status)
+        self.fleet.__enter__()
+
+    def tearDown(self):
+        self.fleet.__exit__()
+
+    def test_plan_waves(self):
+        hosts = ['host{0}'.format(i) for i in range(10)]
+        self.assertEqual([len(wave) for wave in rollout.plan_waves(hosts)],
+                         [1, 2, 4, 3])
+        waves = rollout.plan_waves(hosts, canary=2, growth=3, max_wave=5)
+        self.assertEqual([len(wave) for wave in waves], [2, 5, 3])
+        self.assertEqual(sum(waves, []), hosts)
+        self.assertEqual(rollout.plan_waves([]), [])
+
+    def test_rollout(self):
+        hosts = ['host{0}'.format(i) for i in range(7)]
+        plan = rollout.rollout(hosts)
+        self.assertFalse(plan.halted)
+        self.assertEqual(len(plan.results), 7)
+        self.assertEqual(plan.reboot_required, ['host1'])
+        self.assertEqual(plan.pending, [])
+
+    def test_pool_size(self):
+        hosts = ['host{0}'.format(i) for i in range(100)]
+        rollout.rollout(hosts)
+        self.assertEqual(set(call[4] for call in self.fleet.calls), set([10]))
+        rollout.rollout(hosts, pool_size=50)
+        self.assertEqual(self.fleet.calls[-1][4], 50)
+
+    def test_halt(self):
+        hosts = ['host0', 'host1', 'bad2', 'host3', 'host4', 'host5']
+        plan = rollout.rollout(hosts, max_failure_rate=0.25)
+        self.assertTrue(plan.halted)
+        self.assertEqual([status.host for status in plan.failed], ['bad2'])
+        self.assertEqual(plan.failed[0].error, 'Exited with status 100')
+        self.assertEqual(plan.pending, ['host3', 'host4', 'host5'])
+
+        plan = rollout.rollout(hosts, max_failure_rate=0.5)
+        self.assertFalse(plan.halted)
+        self.assertEqual(plan.pending, [])
+
+    def test_health_check(self):
+        reboot_required = apt.reboot_required
+        apt.reboot_required = lambda: False
+        try:
+            self.assertEqual(
+                rollout._apply(_upgrade, (), {}, _unhealthy),
+                {'succeeded': True, 'return_code': 0, 'healthy': False,
+                 'reboot_required': False})
+            self.assertEqual(
+                rollout._apply(_upgrade, (), {'fail': True}, _unhealthy),
+                {'succeeded': False, 'return_code': 100, 'healthy': None,
+                 'reboot_required': None})
+
+            with fakes.Fleet(local=True):
+                plan = rollout.rollout(['host0', 'host1'], func=_upgrade,
+                                       health_check=_unhealthy)
+        finally:
+            apt.reboot_required = reboot_required
+        self.assertTrue(plan.halted)
+        self.assertEqual(plan.failed[0].error, 'Health check failed')
+        self.assertEqual(plan.failed[0].healthy, False)
+        self.assertEqual(plan.pending, ['host1'])
@@ -0,0 +1,77 @@
+import unittest
+
+from fabric_package_management import fleet, throttle
+from tests import fakes
+
+
+class ThrottleTest(unittest.TestCase):
+
+    def test_fetch_rate(self):
+        self.assertEqual(
+            throttle.fetch_rate('Get:1 http://archive.ubuntu.com trusty\n'
+                                'Fetched 8,430 kB in 3s (2,513 kB/s)\n'),
+            2513.0)
+        self.assertEqual(
+            throttle.fetch_rate('Fetched 52.1 MB in 10s (5.2 MB/s)'),
+            5.2 * 1024)
+        self.assertEqual(throttle.fetch_rate('Fetched 0 B in 0s (0 B/s)'),
+                         None)
+        self.assertEqual(throttle.fetch_rate('Reading package lists...'),
+                         None)
+
+    def test_per_mirror_limit(self):
+        mirrors = {'a1': 'a', 'a2': 'a', 'a3': 'a', 'b1': 'b'}
+        limiter = throttle.Throttle(mirrors, max_hosts=2, adaptive=False,
+                                    queue_mode='access')
+        self.assertEqual(limiter.acquire('a1'),
+                         {'config': {'Acquire::Queue-Mode': 'access'}})
+        self.assertNotEqual(limiter.acquire('a2'), None)
+        self.assertEqual(limiter.acquire('a3'), None)
+        self.assertNotEqual(limiter.acquire('b1'), None)
+        limiter.release(fakes.result('a1'))
+        self.assertNotEqual(limiter.acquire('a3'), None)
+        self.assertEqual(limiter.stats()['a']['running'], 2)
+
+    def test_bandwidth(self):
+        limiter = throttle.Throttle(max_hosts=4, bandwidth=1000)
+        config = limiter.acquire('host')['config']
+        self.assertEqual(config, {'Acquire::http::Dl-Limit': 250})
+
+    def test_adaptive(self):
+        limiter = throttle.Throttle(max_hosts=8, min_hosts=2)
+        limiter.observe(None, 1000.0, 4)
+        self.assertEqual(limiter.stats()[None]['capacity'], 4000.0)
+        self.assertEqual(limiter.stats()[None]['limit'], 8)
+        self.assertEqual(limiter.config(None),
+                         {'Acquire::http::Dl-Limit': 625})
+
+        # The mirror is saturated: more hosts, less aggregate throughput.
+        limiter.observe(None, 250.0, 8)
+        self.assertEqual(limiter.stats()[None]['limit'], 4)
+        limiter.observe(None, 100.0, 4)
+        limiter.observe(None, 100.0, 4)
+        self.assertEqual(limiter.stats()[None]['limit'], 2)
+
+        limiter.observe(None, 1500.0, 2)
+        self.assertEqual(limiter.stats()[None]['limit'], 3)
+
+    def test_release_observes(self):
+        limiter = throttle.Throttle(max_hosts=2)
+        limiter.acquire('host1')
+        limiter.acquire('host2')
+        limiter.release(
+            fakes.result('host2', value='Fetched 1 MB in 1s (1,000 kB/s)'))
+        self.assertEqual(limiter.stats()[None]['capacity'], 2000.0)
+        limiter.release(fakes.result('host1', False, 'E: failed'))
+        self.assertEqual(limiter.stats()[None]['running'], 0)
+
+    def test_merge_config(self):
+        limiter = throttle.Throttle(max_hosts=4, bandwidth=1000)
+        kwargs = {'verbose': False,
+                  'config': {'Acquire::Retries': 3,
+                             'Acquire::http::Dl-Limit': 50}}
+        merged = fleet._merge_kwargs(kwargs, limiter.acquire('host'))
+        self.assertEqual(merged['verbose'], False)
+        self.assertEqual(merged['config']['Acquire::Retries'], 3)
+        self.assertEqual(merged['config']['Acquire::http::Dl-Limit'], 250)
+        self.assertEqual(kwargs['config']['Acquire::http::Dl-Limit'], 50)
@@ -0,0 +1,34 @@
+import unittest
+
+from fabric_package_management import version
+
+
+class VersionTest(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(version.parse('1:2.4.7-1ubuntu4'),
+                         (1, '2.4.7', '1ubuntu4'))
+        self.assertEqual(version.parse('2.4.7'), (0, '2.4.7', ''))
+        self.assertEqual(version.parse('1.0-2-3'), (0, '1.0-2', '3'))
+
+    def test_compare(self):
+        ordered = ['1.0~rc1', '1.0', '1.0-1', '1.0-1ubuntu1', '1.0+b1',
+                   '1.0.1', '1.2', '1.10', '1:0.1']
+        for older, newer in zip(ordered, ordered[1:]):
+            self.assertTrue(version.compare(older, newer) < 0,
+                            '{0} < {1}'.format(older, newer))
+            self.assertTrue(version.compare(newer, older) > 0)
+        self.assertEqual(version.compare('1.01', '1.1'), 0)
+        self.assertEqual(version.compare('0:1.0', '1.0'), 0)
+        self.assertTrue(version.compare('1.0~', '1.0~~') > 0)
+
+    def test_key(self):
+        self.assertEqual(sorted(['1.10', '1.2', '1.2~b1'], key=version.key),
+                         ['1.2~b1', '1.2', '1.10'])
+
+    def test_check(self):
+        self.assertTrue(version.check('2.4.7-1ubuntu4', '>=', '2.4'))
+        self.assertTrue(version.check('2.4', '<<', '2.4.7'))
+        self.assertTrue(version.check('2.4', '=', '2.4'))
+        self.assertFalse(version.check('2.4', '>>', '2.4'))
+        self.assertRaises(ValueError, version.check, '1', '!=', '2')